@@ -6,7 +6,11 @@ from py_class.arbre import Arbre
 from py_class.market import Market
 from py_class.option import Contract
 from py_class.display import gerer_affichage_granulaire
-from py_class.utils import BS, calculate_delta, calculate_gamma, calculate_vega, calculate_volga, calculate_vanna
+from py_class.kernels import prechauffer
+from py_class.utils import BS, calculate_all_greeks, read_pricer_params
+
+# Profondeur maximale de l'arbre pour le pricing récursif (limite de récursion Python)
+RECURSIF_MAX_STEPS = 500
 
 
 @xw.func
@@ -29,25 +33,27 @@ def main():
     ws1 = wb.sheets["Pricer"]
 
     # ===== Lecture des paramètres de marché et d'option depuis Excel =====
-    S = ws1.range("St").value              # Prix actuel du sous-jacent
-    K = ws1.range("Strike").value          # Prix d'exercice (strike) de l'option
-    r = ws1.range("IntRate").value         # Taux d'intérêt sans risque
-    sigma = ws1.range("Vol").value         # Volatilité (annualisée)
-    type_op = ws1.range("OptType").value   # Type d'option: "call" ou "put"
-    ex_op = ws1.range("EU_US").value       # Style d'exercice: "European" ou "American"
-    today = ws1.range("Pr_Date").value     # Date de pricing (aujourd'hui)
-    maturity_date = ws1.range("Mat").value # Date de maturité de l'option
-    div = ws1.range("DivAmount").value     # Montant du dividende
-    div_date = ws1.range("DivDate").value  # Date de détachement du dividende
-
-    N = int(ws1.range("Steps").value)      # Nombre d'étapes dans l'arbre binomial
+    # Un seul aller-retour Excel pour tout le bloc de paramètres
+    params = read_pricer_params(ws1)
+    S = params["St"]                     # Prix actuel du sous-jacent
+    K = params["Strike"]                 # Prix d'exercice (strike) de l'option
+    r = params["IntRate"]                # Taux d'intérêt sans risque
+    sigma = params["Vol"]                # Volatilité (annualisée)
+    type_op = params["OptType"]          # Type d'option: "call" ou "put"
+    ex_op = params["EU_US"]              # Style d'exercice: "European" ou "American"
+    today = params["Pr_Date"]            # Date de pricing (aujourd'hui)
+    maturity_date = params["Mat"]        # Date de maturité de l'option
+    div = params["DivAmount"]            # Montant du dividende
+    div_date = params["DivDate"]         # Date de détachement du dividende
+
+    N = int(params["Steps"])             # Nombre d'étapes dans l'arbre binomial
 
     # ===== Calcul du temps jusqu'à maturité et du timing du dividende =====
     T = (maturity_date - today).days / 365      # Temps jusqu'à maturité en années
     T_div = (div_date - today).days / 365       # Temps jusqu'au dividende en années
 
     # Lecture de la préférence d'affichage pour l'arbre granulaire
-    affichage = ws1.range("I18").value
+    affichage = params["Affichage"]
 
     # ===== Création des objets Market et Contract =====
     # Market contient les paramètres de marché (prix, taux, volatilité, dividendes)
@@ -58,16 +64,15 @@ def main():
                  op_type=type_op, op_exercice=ex_op)
 
     # ===== Construction de l'arbre binomial =====
-    # Mesure du temps de construction de l'arbre
+    # Noyaux Numba chargés avant la mesure du temps de construction de l'arbre
+    prechauffer()
     start = time.perf_counter()
     ar = Arbre(market=m, contract=c, n_steps=N)
     end = time.perf_counter()
     elapsed_time = end - start
-    ws1.range("P10").value = elapsed_time  # Temps de construction de l'arbre
     
     # ===== Calcul du prix Black-Scholes (référence analytique) =====
     bs_price = BS(S, K, T, r, sigma, type_op, div, T_div)
-    ws1.range("P7").value = bs_price
 
     # ===== Pricing par arbre binomial (méthode itérative backward) =====
     # Cette méthode remonte l'arbre depuis les feuilles jusqu'à la racine
@@ -75,28 +80,37 @@ def main():
     backward_tree_price = c.price_iteratively(ar)
     e = time.perf_counter()
     tree_pricing_delay = e - s
-    ws1.range("P8").value = backward_tree_price  # Prix calculé par backward iteration
 
-    # ===== Pricing par arbre binomial (méthode récursive) =====
-    # Méthode alternative utilisant la récursion
-    recursive_tree_price = c.price_recursively(ar)
-    ws1.range("P13").value = recursive_tree_price  # Prix calculé par récursion
+    # ===== Écriture des prix et des temps dans Excel =====
+    # Une écriture par bloc de cellules contiguës (P9 et P12 contiennent des formules)
+    ws1.range("P7").value = [[bs_price],              # Prix Black-Scholes
+                             [backward_tree_price]]   # Prix calculé par backward iteration
+    ws1.range("P10").value = [[elapsed_time],         # Temps de construction de l'arbre
+                              [tree_pricing_delay]]   # Temps de calcul du pricing
 
-    ws1.range("P11").value = tree_pricing_delay  # Temps de calcul du pricing
+    # ===== Pricing par arbre binomial (méthode récursive) =====
+    # Vérification croisée du backward itératif par le parcours récursif depuis la racine.
+    # Une frame Python par colonne: au-delà de RECURSIF_MAX_STEPS la cellule est vidée
+    if N <= RECURSIF_MAX_STEPS:
+        ws1.range("P13").value = c.price_recursively(ar, recursif=True)  # Prix calculé par récursion
+    else:
+        ws1.range("P13").value = None
 
     # ===== Calcul des grecques (sensibilités de l'option) =====
-    tree_delta = calculate_delta(m, c, N)    # Sensibilité au prix du sous-jacent
-    tree_gamma = calculate_gamma(m, c, N)    # Sensibilité du delta (convexité)
-    tree_vega = calculate_vega(m, c, N)      # Sensibilité à la volatilité
-    tree_volga = calculate_volga(m, c, N)    # Sensibilité du vega à la volatilité
-    tree_vanna = calculate_vanna(m, c, N)    # Autre sensibilité de second ordre
-
-    # ===== Écriture des grecques dans Excel =====
-    ws1.range("P18").value = tree_delta   # Sortie Delta
-    ws1.range("P19").value = tree_gamma   # Sortie Gamma 
-    ws1.range("P20").value = tree_vega    # Sortie Vega
-    ws1.range("P21").value = tree_volga   # Sortie Volga
-    ws1.range("P22").value = tree_vanna   # Sortie Vanna
+    # Tous les arbres choqués sont construits une seule fois et partagés entre grecques
+    greeks = calculate_all_greeks(m, c, N)
+    tree_delta = greeks["delta"]    # Sensibilité au prix du sous-jacent
+    tree_gamma = greeks["gamma"]    # Sensibilité du delta (convexité)
+    tree_vega = greeks["vega"]      # Sensibilité à la volatilité
+    tree_volga = greeks["volga"]    # Sensibilité du vega à la volatilité
+    tree_vanna = greeks["vanna"]    # Autre sensibilité de second ordre
+
+    # ===== Écriture des grecques dans Excel (P18:P22 en une seule écriture) =====
+    ws1.range("P18").value = [[tree_delta],   # Sortie Delta
+                              [tree_gamma],   # Sortie Gamma
+                              [tree_vega],    # Sortie Vega
+                              [tree_volga],   # Sortie Volga
+                              [tree_vanna]]   # Sortie Vanna
 
     # ===== Gestion de l'affichage granulaire de l'arbre =====
     # Affiche l'arbre binomial dans Excel si demandé
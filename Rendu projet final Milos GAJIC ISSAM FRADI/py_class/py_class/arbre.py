@@ -1,16 +1,158 @@
+import logging
 import math
+import numpy as np
 from .node import Node
+from .kernels import NUMBA_DISPONIBLE
+from .kernels import construire_arbre as noyau_construire_arbre
+
+logger = logging.getLogger(__name__)
+
+
+def _colonne_suivante_numpy(si, proba_cumule, j_bas, D, croissance, facteur_var, alpha, alpha_inv,
+                            log_alpha, denom_up, denom_down, p_up_const, p_mid_const, p_down_const, prune_eps,
+                            puissances, j_min):
+    """
+    Construit la colonne k+1 de l'arbre à partir de la colonne k en opérations
+    NumPy sur toute la colonne (utilisé si Numba n'est pas installé, voir
+    kernels.colonne_suivante pour les paramètres).
+    """
+    # Forward de chaque nœud : S × exp(r×dt) - D
+    forward = si * croissance - D
+
+    # Le forward du tronc devient le tronc de la colonne suivante
+    mid_suivant = forward[-j_bas]
+
+    # ===== Recherche des next_mid =====
+    # Sans dividende, chaque nœud pointe sur le nœud de même indice relatif
+    j = np.arange(j_bas, j_bas + si.size)
+    if D == 0:
+        j_next = j
+    else:
+        # Indice du nœud dont le prix est le plus proche du forward,
+        # puis ajustement sur les mêmes bornes (milieux) que l'arbre chaîné
+        j_next = np.ceil(np.log(2 * forward / (mid_suivant * (1 + alpha))) / log_alpha).astype(np.int64)
+        j_next += forward > mid_suivant * alpha ** j_next * (1 + alpha) / 2
+        j_next -= forward <= mid_suivant * alpha ** j_next * (1 + alpha_inv) / 2
+
+    # ===== Pruning =====
+    # Les nœuds de probabilité cumulée négligeable n'ont qu'une branche (mid)
+    pruned = proba_cumule < prune_eps
+
+    # ===== Bornes de la colonne suivante =====
+    j_bas_suivant = j_next[0] - (0 if pruned[0] else 1)
+    j_haut_suivant = j_next[-1] + (0 if pruned[-1] else 1)
+    if j_min <= j_bas_suivant and j_haut_suivant < j_min + puissances.size:
+        si_suivant = mid_suivant * puissances[j_bas_suivant - j_min:j_haut_suivant + 1 - j_min]
+    else:
+        si_suivant = mid_suivant * alpha ** np.arange(j_bas_suivant, j_haut_suivant + 1, dtype=np.float64)
+    pos_mid = j_next - j_bas_suivant  # Position du next_mid dans la colonne suivante
+
+    # ===== Calcul des probabilités de transition =====
+    if D == 0:
+        # Même triplet pour toute la colonne
+        p_up = np.full(si.size, p_up_const)
+        p_mid = np.full(si.size, p_mid_const)
+        p_down = np.full(si.size, p_down_const)
+    else:
+        # Étape de dividende : le forward ne tombe plus sur le next_mid, calcul par nœud
+        nmv = si_suivant[pos_mid]
+        var = si * si * facteur_var
+        ratio = forward / nmv
+        p_down = ((var + forward ** 2) / nmv ** 2 - 1 - (alpha + 1) * (ratio - 1)) / denom_down
+        p_up = (ratio - 1 - (alpha_inv - 1) * p_down) / denom_up
+        p_mid = 1 - p_up - p_down
+
+    # Nœuds prunés : toute la probabilité va vers le nœud mid
+    p_up[pruned] = 0.0
+    p_down[pruned] = 0.0
+    p_mid[pruned] = 1.0
+
+    # ===== Propagation des probabilités cumulées =====
+    # Plusieurs nœuds peuvent alimenter la même cible : accumulation par bincount
+    n_suivant = si_suivant.size
+    pos_up = np.where(pruned, pos_mid, pos_mid + 1)
+    pos_down = np.where(pruned, pos_mid, pos_mid - 1)
+    pc_suivant = (np.bincount(pos_mid, proba_cumule * p_mid, n_suivant)
+                  + np.bincount(pos_up, proba_cumule * p_up, n_suivant)
+                  + np.bincount(pos_down, proba_cumule * p_down, n_suivant))
+
+    return si_suivant, pc_suivant, p_up, p_mid, p_down, pruned, pos_mid, j_bas_suivant
+
+
+def _construire_arbre_numpy(S0, N, div_step, div, croissance, facteur_var, alpha, alpha_inv,
+                            log_alpha, denom_up, denom_down, p_up_const, p_mid_const, p_down_const,
+                            prune_eps, puissances, j_min):
+    """
+    Construit toutes les colonnes de l'arbre et les concatène dans des tableaux plats
+    (version NumPy de kernels.construire_arbre, mêmes paramètres et mêmes sorties).
+    """
+    # ===== Colonne 0 : la racine =====
+    si = np.array([S0], dtype=np.float64)
+    proba_cumule = np.ones(1)  # Probabilité cumulée = 1 à la racine
+    j_bas = 0                  # Indice relatif du nœud le plus bas de la colonne
+
+    # Colonnes construites (concaténées à la fin)
+    cols_si, cols_pc = [si], [proba_cumule]
+    cols_up, cols_mid, cols_down, cols_pruned, cols_next = [], [], [], [], []
+    tronc = [0]
+    debut = [0, 1]
+
+    # ===== Boucle principale : construction étape par étape =====
+    for k in range(N):
+        # Dividende détaché pendant cette étape ?
+        D = div if k == div_step else 0.0
+
+        (si_suivant, pc_suivant, p_up, p_mid, p_down,
+         pruned, pos_mid, j_bas_suivant) = _colonne_suivante_numpy(
+            si, proba_cumule, j_bas, D, croissance, facteur_var, alpha, alpha_inv,
+            log_alpha, denom_up, denom_down, p_up_const, p_mid_const, p_down_const,
+            prune_eps, puissances, j_min)
+
+        # ===== Enregistrement de la colonne k et passage à k+1 =====
+        cols_up.append(p_up)
+        cols_mid.append(p_mid)
+        cols_down.append(p_down)
+        cols_pruned.append(pruned)
+        cols_next.append(debut[-1] + pos_mid)
+
+        tronc.append(debut[-1] - j_bas_suivant)
+        debut.append(debut[-1] + si_suivant.size)
+        cols_si.append(si_suivant)
+        cols_pc.append(pc_suivant)
+
+        si, proba_cumule, j_bas = si_suivant, pc_suivant, j_bas_suivant
+
+    # ===== Dernière colonne (maturité) : pas de transition =====
+    n_feuilles = si.size
+    cols_up.append(np.full(n_feuilles, np.nan))
+    cols_mid.append(np.full(n_feuilles, np.nan))
+    cols_down.append(np.full(n_feuilles, np.nan))
+    cols_pruned.append(np.zeros(n_feuilles, dtype=bool))
+    cols_next.append(np.full(n_feuilles, -1, dtype=np.int64))
+
+    return (np.concatenate(cols_si), np.concatenate(cols_pc), np.concatenate(cols_up),
+            np.concatenate(cols_mid), np.concatenate(cols_down), np.concatenate(cols_pruned),
+            np.concatenate(cols_next), np.array(debut, dtype=np.int64), np.array(tronc, dtype=np.int64))
+
+
+# Construction de l'arbre: noyau compilé si Numba est disponible
+construire_arbre = noyau_construire_arbre if NUMBA_DISPONIBLE else _construire_arbre_numpy
+
 
 class Arbre:
 
     #Classe représentant un arbre trinomial pour le pricing d'options.
+    #Les nœuds sont stockés colonne par colonne dans des tableaux NumPy plats
+    #(un tableau par attribut), la colonne k occupant [_debut[k], _debut[k+1]).
 
+    # Seuil de pruning: un nœud de probabilité cumulée inférieure n'a plus que sa
+    # branche mid, la colonne suivante ne s'élargit donc plus de ce côté
+    prune_eps = 10**-8
 
-    
-    def __init__(self, market, contract, n_steps: int):
+    def __init__(self, market, contract, n_steps: int, method: str = "trinomial"):
         """
         Initialisation de l'arbre trinomial.
-        
+
         Paramètres:
         -----------
         market : Market
@@ -19,64 +161,148 @@ class Arbre:
             Objet contenant les caractéristiques du contrat d'option
         n_steps : int
             Nombre d'étapes (périodes) dans l'arbre
+        method : str, optional
+            "trinomial" (par défaut) ou "LR" (binomial de Leisen-Reimer, voir lr_tree.py).
+            Avec "LR", aucun nœud n'est construit: l'arbre ne sert qu'au pricing.
+            Un nombre d'étapes pair est alors porté à l'impair suivant: arbre.n_steps
+            peut donc valoir n_steps + 1
         """
+        if method not in ("trinomial", "LR"):
+            raise ValueError("method doit être 'trinomial' ou 'LR'")
+        self.method = method
+
+        # Leisen-Reimer: l'inversion de Peizer-Pratt suppose un nombre d'étapes impair
+        # (avec N pair le strike n'est plus centré et l'erreur redevient en O(1/N))
+        if method == "LR" and n_steps % 2 == 0:
+            logger.debug("Leisen-Reimer : n_steps pair (%d) porté à %d", n_steps, n_steps + 1)
+            n_steps += 1
+
         self.market = market
         self.contract = contract
         self.n_steps = n_steps
-        
+
         # Calcul du pas de temps (dt) : durée de chaque période en années
         self.dt = self.contract.maturity / n_steps
-        
+
         # Calcul du coefficient alpha pour le facteur de hausse/baisse
         self.alpha = math.exp(self.market.sigma * math.sqrt(3 * self.dt))
-        
+        self._alpha_inv = 1.0 / self.alpha
+
+        # Facteur de croissance sur un pas de temps: exp(r×dt), constant sur tout l'arbre
+        self._growth = math.exp(self.market.int_rate * self.dt)
+        # Facteur d'actualisation sur un pas de temps: exp(-r×dt), partagé par les pricers
+        self._df = math.exp(-self.market.int_rate * self.dt)
+
+        # Constantes des formules de variance et de probabilités, communes à tous les nœuds
+        # Var(S) = S² × _facteur_var
+        self._facteur_var = math.exp(2 * self.market.int_rate * self.dt) * (math.exp((self.market.sigma ** 2) * self.dt) - 1)
+        self._denom_down = (1 - self.alpha) * (self._alpha_inv * self._alpha_inv - 1)
+        self._denom_up = self.alpha - 1
+
+        # Étape de détachement du dividende, calculée une seule fois (-1 si aucune)
+        self._div_step = self._trouver_etape_dividende()
+
         # Initialisation de la racine (nœud initial) de l'arbre
         self.racine = None
-        
-        # Génération complète de l'arbre trinomial
-        self._generer_arbre(n_steps)
+
+        # Génération complète de l'arbre trinomial (l'arbre LR est parcouru au pricing)
+        if method == "trinomial":
+            self._generer_arbre(n_steps)
+
+    def rebaser(self, market):
+        """
+        Construit l'arbre d'un marché ne différant que par le prix du sous-jacent,
+        en réutilisant la topologie de cet arbre.
+
+        Sans dividende, l'arbre est homogène en S: les probabilités, le pruning
+        et les indices (next_mid, bornes des colonnes) ne dépendent que de sigma,
+        r et dt. Seuls les prix des nœuds sont recalculés (mis à l'échelle).
+
+        Paramètres:
+        -----------
+        market : Market
+            Marché identique à self.market, à l'exception de stock_price
+
+        Retourne:
+        ---------
+        Arbre
+            Nouvel arbre partageant les tableaux de topologie et de probabilités
+        """
+        if self.method != "trinomial":
+            raise ValueError("rebaser nécessite un arbre trinomial")
+        if self._div_step >= 0:
+            raise ValueError("Un arbre avec dividende ne peut pas être rebasé: topologie dépendante de S")
+
+        arbre = Arbre.__new__(Arbre)
+        arbre.__dict__.update(self.__dict__)
+        arbre.market = market
+
+        # Tableaux propres au nouvel arbre: prix des nœuds et prix de l'option
+        arbre._si = self._si * (market.stock_price / self.market.stock_price)
+        arbre._si2 = np.full(self._si.size, np.nan)
+        arbre.racine = Node(arbre, 0, 0)
+        return arbre
+
+    def _trouver_etape_dividende(self) -> int:
+        """
+        Détermine l'étape pendant laquelle le dividende est détaché.
+
+        Retourne:
+        ---------
+        int
+            Étape k telle que k×dt < date du dividende <= (k+1)×dt, -1 si aucune
+        """
+        # Si aucune date de dividende n'est définie, pas d'étape de dividende
+        if self.market.div_date is None:
+            return -1
+
+        # Conversion de la date de dividende en temps (années depuis pricing_date)
+        div_years = (self.market.div_date - self.contract.pricing_date).days / 365.0
+
+        # Candidat direct, puis vérification des voisins avec les mêmes bornes
+        # que le test par étape (évite les erreurs d'arrondi aux frontières)
+        candidat = math.ceil(div_years / self.dt) - 1
+        for step in (candidat - 1, candidat, candidat + 1):
+            if 0 <= step < self.n_steps and step * self.dt < div_years <= (step + 1) * self.dt:
+                return step
+        return -1
 
     def is_dividend(self, step: int) -> bool:
         """
         Vérifie si un dividende est détaché pendant l'étape donnée.
-        
+
         Paramètres:
         -----------
         step : int
             Numéro de l'étape à vérifier (0 à n_steps-1)
-            
+
         Retourne:
         ---------
         bool
             True si un dividende est détaché pendant cette étape, False sinon
         """
-        # Si aucune date de dividende n'est définie, retourner False
-        if self.market.div_date is None:
-            return False
-        
-        # Calcul du temps de début et de fin de l'étape
-        t_start = step * self.dt
-        t_end = (step + 1) * self.dt
-        
-        # Conversion de la date de dividende en temps (années depuis pricing_date)
-        div_date = (self.market.div_date - self.contract.pricing_date).days / 365.0
-        
-        # Vérification si le dividende tombe dans l'intervalle de temps de cette étape
-        return t_start < div_date <= t_end
+        return step == self._div_step
 
     def _generer_arbre(self, N: int):
         """
-        Génère l'arbre trinomial complet en construisant tous les nœuds et leurs connexions.
-        
+        Génère l'arbre trinomial complet, colonne par colonne, sous forme de tableaux NumPy.
+
+        Chaque colonne k est un vecteur de prix trié du plus bas au plus haut.
+        Tous les nœuds d'une colonne sont de la forme tronc × alpha^j, j étant
+        l'indice relatif au tronc (chemin central de l'arbre).
+
         Algorithme:
         -----------
-        1. Initialisation de la racine avec le prix du sous-jacent actuel
-        2. Pour chaque étape k de 0 à N-1:
+        1. Initialisation de la colonne 0 avec le prix du sous-jacent actuel
+        2. Pour chaque étape k de 0 à N-1, sur la colonne entière:
            a. Vérifie si un dividende est détaché
-           b. Construit la partie haute de l'arbre (nœuds au-dessus du tronc)
-           c. Construit la partie basse de l'arbre (nœuds en-dessous du tronc)
-           d. Avance le tronc d'une étape
-        
+           b. Calcule les forwards S × exp(r×dt) - D et le nouveau tronc
+           c. Trouve l'indice du next_mid de chaque nœud (nœud le plus proche du forward)
+           d. Calcule les probabilités de transition (formules fermées, constantes
+              hors étape de dividende)
+           e. Construit la colonne suivante et propage les probabilités cumulées
+        3. Concatène les colonnes dans les tableaux plats de l'arbre
+
         Paramètres:
         -----------
         N : int
@@ -84,96 +310,44 @@ class Arbre:
         """
         # ===== Définition des paramètres initiaux =====
         S0 = self.market.stock_price  # Prix initial du sous-jacent
-        r = self.market.int_rate      # Taux d'intérêt sans risque
-        dt = self.dt                  # Pas de temps
-        
-        # Création du nœud racine avec le prix initial
-        self.racine = Node(si=S0, arbre=self)
-        self.racine.proba_cumule = 1  # Probabilité cumulée = 1 à la racine
-        
-        # Le tronc représente le chemin central de l'arbre
-        noeud_tronc = self.racine
-
-        # ===== Boucle principale : construction étape par étape =====
-        for k in range(N):
-            # Vérification si un dividende est détaché pendant cette étape
-            if self.is_dividend(k):
-                D = self.market.div  # Montant du dividende
-                print(f'div {D}, {k}, {self.market.div_date}, {(self.market.div_date - self.contract.pricing_date).days / 365.0}')
-            else:
-                D = 0  # Pas de dividende
-            
-            # Point de départ pour traiter les nœuds de l'étape k
-            noeud_a_traiter = noeud_tronc
-            
-            # Calcul de la valeur forward pour le nœud du tronc
-            # Forward = S * exp(r*dt) - Dividende
-            forward_val = noeud_tronc.si * math.exp(r * dt) - D
-            
-            # Création du nœud mid suivant avec la valeur forward
-            last_next_mid = Node(si=forward_val, arbre=self)
-            
-            # Mémorisation du prochain nœud up pour la construction
-            noeud_next_up_memory = last_next_mid
-
-            # ===== Construction de la partie HAUTE de l'arbre =====
-            # Remonte depuis le tronc vers le haut (voisin_up)
-            while noeud_a_traiter is not None:
-                # Calcul de la valeur forward pour ce nœud
-                forward = noeud_a_traiter.si * math.exp(r * dt) - D
-                
-                # Fonction qui crée et/ou lie les nœuds de la colonne suivante
-                # Cette fonction connecte le nœud actuel à ses trois descendants possibles
-                last_next_mid = noeud_a_traiter.set_next_mid(forward, noeud_next_up_memory, D)
-                
-                # Passage au nœud supérieur dans la colonne actuelle
-                noeud_a_traiter = noeud_a_traiter.voisin_up
-                
-                # Mise à jour de la mémoire du nœud up suivant
-                noeud_next_up_memory = last_next_mid.voisin_up
-                
-                # Si on a besoin d'un nouveau nœud up et qu'il reste des nœuds à traiter
-                # Ceci est nécessaire pour le prunning
-                if noeud_next_up_memory is None and noeud_a_traiter is not None:
-                    # Création d'un nouveau nœud up avec un prix plus élevé (multiplication par alpha)
-                    noeud_next_up_memory = Node(si=last_next_mid.si * self.alpha, arbre=self)
-                    
-                    # Liaison bidirectionnelle entre les nœuds up et mid
-                    noeud_next_up_memory.voisin_down = last_next_mid
-                    last_next_mid.voisin_up = noeud_next_up_memory
-
-            # ===== Préparation pour la construction de la partie BASSE =====
-            # Retour au tronc et descente vers le bas
-            noeud_a_traiter = noeud_tronc.voisin_down
-            last_next_mid = noeud_tronc.next_mid
-            
-            # Mémorisation du prochain nœud down
-            noeud_next_down_memory = last_next_mid.voisin_down
-
-            # ===== Construction de la partie BASSE de l'arbre =====
-            # Descend depuis le tronc vers le bas (voisin_down)
-            while noeud_a_traiter is not None:
-                # Calcul de la valeur forward pour ce nœud
-                forward = noeud_a_traiter.si * math.exp(r * dt) - D
-                
-                # Création et liaison des nœuds suivants
-                last_next_mid = noeud_a_traiter.set_next_mid(forward, noeud_next_down_memory, D)
-                
-                # Passage au nœud inférieur dans la colonne actuelle
-                noeud_a_traiter = noeud_a_traiter.voisin_down
-                
-                # Mise à jour de la mémoire du nœud down suivant
-                noeud_next_down_memory = last_next_mid.voisin_down
-                
-                # Si on a besoin d'un nouveau nœud down et qu'il reste des nœuds à traiter
-                if noeud_next_down_memory is None and noeud_a_traiter is not None:
-                    # Création d'un nouveau nœud down avec un prix plus bas (division par alpha)
-                    noeud_next_down_memory = Node(si=last_next_mid.si / self.alpha, arbre=self)
-                    
-                    # Liaison bidirectionnelle entre les nœuds down et mid
-                    noeud_next_down_memory.voisin_up = last_next_mid
-                    last_next_mid.voisin_down = noeud_next_down_memory
-
-            # ===== Avancement du tronc pour l'étape suivante =====
-            # Le nouveau tronc est le nœud mid suivant de l'ancien tronc
-            noeud_tronc = noeud_tronc.next_mid
\ No newline at end of file
+        alpha = self.alpha
+        alpha_inv = self._alpha_inv
+
+        # ===== Constantes communes à tous les nœuds (calculées dans __init__) =====
+        croissance = self._growth
+        facteur_var = self._facteur_var
+        denom_down = self._denom_down
+        denom_up = self._denom_up
+        log_alpha = math.log(alpha)
+
+        # ===== Probabilités sans dividende : identiques pour tous les nœuds =====
+        # Le forward tombe exactement sur le next_mid (ratio = 1) et
+        # var / forward² = exp(sigma²×dt) - 1 : seuls sigma et dt interviennent
+        p_down_const = (facteur_var / croissance ** 2) / denom_down
+        p_up_const = -(alpha_inv - 1) * p_down_const / denom_up
+        p_mid_const = 1 - p_up_const - p_down_const
+
+        # ===== Table des puissances alpha^j, j dans [-(N+1), N+1] =====
+        # Couvre toutes les colonnes sans dividende (un dividende peut décaler les indices:
+        # les noyaux retombent alors sur un calcul direct hors de la table)
+        j_min = -(N + 1)
+        puissances = alpha ** np.arange(j_min, N + 2, dtype=np.float64)
+
+        # Le dividende est détaché pendant l'étape _div_step (aucune si -1)
+        D = 0.0
+        if self._div_step >= 0:
+            D = float(self.market.div)
+            logger.debug("div %s step=%s date=%s t=%s", self.market.div, self._div_step, self.market.div_date,
+                         (self.market.div_date - self.contract.pricing_date).days / 365.0)
+
+        # ===== Construction de toutes les colonnes (noyau Numba ou boucle NumPy) =====
+        # Stockage SoA : un tableau plat par attribut
+        (self._si, self._proba_cumule, self._p_up, self._p_mid, self._p_down,
+         self._pruned, self._next_mid, self._debut, self._tronc) = construire_arbre(
+            float(S0), N, self._div_step, D, croissance, facteur_var,
+            alpha, alpha_inv, log_alpha, denom_up, denom_down,
+            p_up_const, p_mid_const, p_down_const, self.prune_eps, puissances, j_min)
+        self._si2 = np.full(self._si.size, np.nan)  # Prix de l'option (rempli au pricing)
+
+        # Création du nœud racine (vue sur l'indice 0)
+        self.racine = Node(self, 0, 0)
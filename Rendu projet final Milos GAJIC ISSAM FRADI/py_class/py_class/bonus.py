@@ -1,10 +1,64 @@
 import time
+import numpy as np
 import xlwings as xw
 
 from .market import Market
 from .option import Contract
 from .arbre import Arbre
-from .utils import BS, calculate_delta, calculate_gamma, calculate_vega,calculate_volga,calculate_vanna
+from .kernels import prechauffer
+from .utils import BS, BS_vec, calculate_all_greeks, read_pricer_params
+
+
+# ===== Cache des prix par arbre pour les balayages =====
+# Clé: paramètres de l'option ; valeur: {nombre d'étapes N: prix}
+# Relancer une analyse avec les mêmes paramètres ne reconstruit aucun arbre
+# Au plus _SWEEP_CACHE_MAX jeux de paramètres, les moins récemment utilisés sont évincés
+_SWEEP_CACHE_MAX = 8
+_sweep_cache: dict[tuple, dict[int, float]] = {}
+
+
+def clear_sweep_cache():
+    """
+    Vide le cache des prix des balayages (libère la mémoire de la session xlwings).
+    """
+    _sweep_cache.clear()
+
+
+def _cached_tree_price(market, contract, n_steps):
+    """
+    Retourne le prix par arbre trinomial, en le calculant seulement s'il n'est pas en cache.
+    
+    Paramètres:
+    -----------
+    market : Market
+        Paramètres de marché
+    contract : Contract
+        Caractéristiques de l'option
+    n_steps : int
+        Nombre d'étapes de l'arbre
+        
+    Retourne:
+    ---------
+    float
+        Prix de l'option
+    """
+    key = (market.stock_price, contract.strike, market.int_rate, market.sigma,
+           contract.op_type, contract.op_exercice, contract.pricing_date,
+           contract.maturity_date, market.div, market.div_date,
+           Arbre.prune_eps)  # Seuil de pruning modifiable à l'exécution: fait partie de la clé
+    # Dictionnaire ordonné par usage: la clé consultée repasse en dernière position
+    prices = _sweep_cache.pop(key, None)
+    if prices is None:
+        prices = {}
+        if len(_sweep_cache) >= _SWEEP_CACHE_MAX:
+            del _sweep_cache[next(iter(_sweep_cache))]
+    _sweep_cache[key] = prices
+    
+    if n_steps not in prices:
+        ar = Arbre(market, contract, n_steps)
+        prices[n_steps] = contract.price_iteratively(ar)
+    
+    return prices[n_steps]
 
 
 def elapsed():
@@ -27,16 +81,17 @@ def elapsed():
     ws_perf.range("B2:B20000").clear_contents()
 
     # ===== Lecture des paramètres de l'option depuis la feuille Pricer =====
-    S = ws_pricer.range("St").value              # Prix du sous-jacent
-    K = ws_pricer.range("Strike").value          # Strike
-    r = ws_pricer.range("IntRate").value         # Taux d'intérêt
-    sigma = ws_pricer.range("Vol").value         # Volatilité
-    type_op = ws_pricer.range("OptType").value   # Call ou Put
-    ex_op = ws_pricer.range("EU_US").value       # EU ou US
-    today = ws_pricer.range("Pr_Date").value     # Date de pricing
-    maturity = ws_pricer.range("Mat").value      # Date de maturité
-    div = ws_pricer.range("DivAmount").value     # Montant du dividende
-    div_date = ws_pricer.range("DivDate").value  # Date du dividende
+    params = read_pricer_params(ws_pricer)  # Un seul aller-retour Excel
+    S = params["St"]                 # Prix du sous-jacent
+    K = params["Strike"]             # Strike
+    r = params["IntRate"]            # Taux d'intérêt
+    sigma = params["Vol"]            # Volatilité
+    type_op = params["OptType"]      # Call ou Put
+    ex_op = params["EU_US"]          # EU ou US
+    today = params["Pr_Date"]        # Date de pricing
+    maturity = params["Mat"]         # Date de maturité
+    div = params["DivAmount"]        # Montant du dividende
+    div_date = params["DivDate"]     # Date du dividende
     
     # ===== Calcul des temps en années =====
     T_div = (div_date - today).days / 365  # Temps jusqu'au dividende
@@ -54,12 +109,13 @@ def elapsed():
     n_rows = ws_perf.range("A2").expand("down").value
     N_list = [int(n) for n in n_rows if n is not None]
     
-    # ===== Variables pour stocker les résultats =====
-    elapsed_times = []  # Temps d'exécution pour chaque N
-    res = []            # Temps et erreur pour chaque N
+    # ===== Tableau des résultats, alloué une fois =====
+    # Colonne 0: temps d'exécution ; colonne 1: erreur par rapport à Black-Scholes
+    res = np.empty((len(N_list), 2))
     
     # ===== Boucle principale: test pour chaque nombre d'étapes =====
-    for k in N_list:
+    prechauffer()  # Noyaux Numba chargés hors des mesures de temps
+    for i, k in enumerate(N_list):
         # --- Mesure du temps de début ---
         start = time.time()
         
@@ -72,12 +128,12 @@ def elapsed():
         elapsed = end - start  
 
         # --- Stockage des résultats ---
-        elapsed_times.append([elapsed])
-        res.append([elapsed, price - bs_price]) 
+        res[i, 0] = elapsed
+        res[i, 1] = price - bs_price
 
-    # ===== Écriture des résultats dans Excel =====
-    ws_perf.range("B2").value = elapsed_times  
-    ws_perf.range("O2").value = res           
+    # ===== Écriture des résultats dans Excel (un bloc par plage) =====
+    ws_perf.range("B2").value = res[:, :1]  # Temps d'exécution
+    ws_perf.range("O2").value = res         # Temps et erreur
 
 
 def TreevsBS():
@@ -94,21 +150,22 @@ def TreevsBS():
     ws_pricer = wb.sheets("Pricer")
 
     # ===== Lecture des paramètres depuis la feuille Pricer =====
-    S = ws_pricer.range("St").value
-    K = ws_pricer.range("Strike").value
-    r = ws_pricer.range("IntRate").value
-    sigma = ws_pricer.range("Vol").value
-    type_op = ws_pricer.range("OptType").value
-    ex_op = ws_pricer.range("EU_US").value
-    today = ws_pricer.range("Pr_Date").value
-    maturity = ws_pricer.range("Mat").value
-    div = ws_pricer.range("DivAmount").value
-    div_date = ws_pricer.range("DivDate").value
+    params = read_pricer_params(ws_pricer)  # Un seul aller-retour Excel
+    S = params["St"]
+    K = params["Strike"]
+    r = params["IntRate"]
+    sigma = params["Vol"]
+    type_op = params["OptType"]
+    ex_op = params["EU_US"]
+    today = params["Pr_Date"]
+    maturity = params["Mat"]
+    div = params["DivAmount"]
+    div_date = params["DivDate"]
     
     # ===== Calcul des temps =====
     T_div = (div_date - today).days / 365
     T = (maturity - today).days / 365
-    N_steps = int(ws_pricer.range("Steps").value)
+    N_steps = int(params["Steps"])
 
     m1 = Market(stock_price=S, int_rate=r, sigma=sigma, div=div, div_date=div_date)
     c1 = Contract(pricing_date=today, maturity_date=maturity, strike=K, 
@@ -121,28 +178,28 @@ def TreevsBS():
     n_rows = ws_BS.range("A2").expand("down").value
     N_list = [int(n) for n in n_rows if n is not None]
     
-    results = []
-    for k in N_list:
-        # Construction de l'arbre avec k étapes
-        ar1 = Arbre(m1, c1, k)
-        price_tree = c1.price_iteratively(ar1)
+    results = np.empty((len(N_list), 3))
+    for i, k in enumerate(N_list):
+        # Prix avec un arbre à k étapes (construit seulement si absent du cache)
+        price_tree = _cached_tree_price(m1, c1, k)
         
-        results.append([price_tree, price_bs, (price_tree - price_bs) * k])
+        results[i] = (price_tree, price_bs, (price_tree - price_bs) * k)
 
     # ===== ANALYSE 2: Sensibilité au strike =====
     n_S_rows = ws_BS.range("O2").expand("down").value
     S_list = [int(s) for s in n_S_rows if s is not None]
     
-    res_S = []
-    for strike in S_list:
+    # Prix Black-Scholes de tous les strikes en un seul appel vectorisé
+    prices_bs_s = BS_vec(S, np.array(S_list, dtype=np.float64), T, r, sigma, type_op, div, T_div)
+    
+    res_S = np.empty((len(S_list), 3))
+    for i, (strike, price_bs_s) in enumerate(zip(S_list, prices_bs_s.tolist())):
         m2 = Market(stock_price=S, int_rate=r, sigma=sigma, div=div, div_date=div_date)
         c2 = Contract(pricing_date=today, maturity_date=maturity, strike=strike, 
                       op_type=type_op, op_exercice=ex_op)
         
-        ar2 = Arbre(m2, c2, n_steps=N_steps)
-        price_tree_s = c2.price_iteratively(ar2)
-        price_bs_s = BS(S, strike, T, r, sigma, type_op, div, T_div)
-        res_S.append([price_tree_s, price_bs_s, price_tree_s - price_bs_s])
+        price_tree_s = _cached_tree_price(m2, c2, N_steps)
+        res_S[i] = (price_tree_s, price_bs_s, price_tree_s - price_bs_s)
 
     # ===== Écriture des résultats dans Excel =====
     ws_BS.range("B2").value = results  
@@ -164,25 +221,27 @@ def Greeks():
     ws_pricer = wb.sheets("Pricer")
 
     # ===== Lecture des paramètres depuis la feuille Pricer =====
-    K = ws_pricer.range("Strike").value  # Strike
-    r = ws_pricer.range("IntRate").value  # Taux d'intérêt
-    sigma = ws_pricer.range("Vol").value  # Volatilité
-    type_op = ws_pricer.range("OptType").value  # Call ou Put
-    ex_op = ws_pricer.range("EU_US").value  # EU ou US
-    today = ws_pricer.range("Pr_Date").value  # Date de pricing
-    maturity = ws_pricer.range("Mat").value  # Date de maturité
-    div = ws_pricer.range("DivAmount").value  # Dividende
-    div_date = ws_pricer.range("DivDate").value  # Date du dividende
-    N_steps = int(ws_pricer.range("Steps").value)  # Nombre d'étapes
+    params = read_pricer_params(ws_pricer)  # Un seul aller-retour Excel
+    K = params["Strike"]             # Strike
+    r = params["IntRate"]            # Taux d'intérêt
+    sigma = params["Vol"]            # Volatilité
+    type_op = params["OptType"]      # Call ou Put
+    ex_op = params["EU_US"]          # EU ou US
+    today = params["Pr_Date"]        # Date de pricing
+    maturity = params["Mat"]         # Date de maturité
+    div = params["DivAmount"]        # Dividende
+    div_date = params["DivDate"]     # Date du dividende
+    N_steps = int(params["Steps"])   # Nombre d'étapes
 
     # ===== Lecture de la liste des prix du sous-jacent à tester =====
     n_rows = ws_G.range("A2").expand("down").value
     N_list = [int(n) for n in n_rows if n is not None]
 
-    results = []
+    # Une ligne par prix: Delta, Gamma, Vega, Volga, Vanna
+    results = np.empty((len(N_list), 5))
 
     # ===== Boucle principale: calcul des grecques pour chaque prix =====
-    for stock in N_list:
+    for i, stock in enumerate(N_list):
         # --- Création du Market avec le prix du sous-jacent variable ---
         m = Market(stock_price=stock, int_rate=r, sigma=sigma, div=div, div_date=div_date)
 
@@ -190,15 +249,12 @@ def Greeks():
         c = Contract(pricing_date=today, maturity_date=maturity, strike=K,
                      op_type=type_op, op_exercice=ex_op)
 
-        # --- Calcul des grecques ---
-        tree_delta = calculate_delta(m, c, N_steps)
-        tree_gamma = calculate_gamma(m, c, N_steps)
-        tree_vega = calculate_vega(m, c, N_steps)
-        tree_volga = calculate_volga(m, c, N_steps)
-        tree_vanna = calculate_vanna(m, c, N_steps)
+        # --- Calcul des grecques (arbres choqués partagés) ---
+        greeks = calculate_all_greeks(m, c, N_steps)
 
         # --- Stockage des résultats ---
-        results.append([tree_delta, tree_gamma, tree_vega, tree_volga, tree_vanna])
+        results[i] = (greeks["delta"], greeks["gamma"], greeks["vega"],
+                      greeks["volga"], greeks["vanna"])
 
     # ===== Écriture des résultats dans Excel =====
     ws_G.range("B2").value = results
\ No newline at end of file
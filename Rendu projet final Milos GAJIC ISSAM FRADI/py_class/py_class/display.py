@@ -1,8 +1,14 @@
+import logging
+import sys
 import xlwings as xw
-import math
+from contextlib import contextmanager
+import numpy as np
 
-# ===== Liste de toutes les feuilles Python générées automatiquement =====
-ALL_PY_SHEETS = [
+logger = logging.getLogger(__name__)
+
+# ===== Ensemble de toutes les feuilles Python générées automatiquement =====
+# frozenset: test d'appartenance en O(1) pour chaque feuille du classeur
+ALL_PY_SHEETS = frozenset({
     "Py_Prix_SI",          # Prix du sous-jacent à chaque nœud
     "Py_Prix_Option",      # Prix de l'option à chaque nœud
     "Py_Proba_Up",         # Probabilités de transition vers le haut
@@ -10,7 +16,48 @@ ALL_PY_SHEETS = [
     "Py_Proba_Down",       # Probabilités de transition vers le bas
     "Py_Proba_Cumulee",    # Probabilités cumulées d'atteindre chaque nœud
     "Py_Variance"          # Variance à chaque nœud
-]
+})
+
+# ===== Feuilles affichées: (nom, titre, attribut des nœuds lu), dans l'ordre d'affichage =====
+SHEET_TABLE = (
+    ("Py_Prix_SI", "Prix du Sous-Jacent (si)", "si"),
+    ("Py_Prix_Option", "Prix de l'Option (si2)", "si2"),
+    ("Py_Proba_Up", "Proba Up (p_up)", "p_up"),
+    ("Py_Proba_Mid", "Proba Mid (p_mid)", "p_mid"),
+    ("Py_Proba_Down", "Proba Down (p_down)", "p_down"),
+    ("Py_Proba_Cumulee", "Proba Cumulée", "proba_cumule"),
+    ("Py_Variance", "Variance", "si"),   # La variance se déduit du prix du sous-jacent
+)
+
+# ===== Attribut des nœuds lu pour chaque feuille (dans l'ordre d'affichage) =====
+SHEET_FIELDS = {name: champ for name, _, champ in SHEET_TABLE}
+
+
+@contextmanager
+def _excel_batch(app):
+    """
+    Suspend les mises à jour d'Excel le temps d'un bloc d'écritures.
+    
+    Les options sont modifiées une seule fois à l'entrée et rétablies à la
+    sortie, y compris si une exception interrompt l'affichage (Excel ne reste
+    pas en calcul manuel).
+    
+    Paramètres:
+    -----------
+    app : xw.App
+        Application Excel du classeur
+    """
+    app.api.ScreenUpdating = False     # Pas de rafraîchissement d'écran
+    app.api.Calculation = -4135        # xlCalculationManual: calcul manuel
+    app.api.EnableEvents = False       # TRÈS IMPORTANT avant de supprimer des feuilles
+    app.api.DisplayAlerts = False      # Pas de confirmation à la suppression des feuilles
+    try:
+        yield
+    finally:
+        app.api.Calculation = -4105    # xlCalculationAutomatic: calcul automatique
+        app.api.EnableEvents = True    # Réactivation des événements
+        app.api.DisplayAlerts = True   # Réactivation des alertes
+        app.api.ScreenUpdating = True  # Réactivation du rafraîchissement d'écran
 
 
 def _get_or_create_sheet(wb, sheet_name):
@@ -20,19 +67,24 @@ def _get_or_create_sheet(wb, sheet_name):
     Cette fonction utilitaire permet de gérer dynamiquement les feuilles Excel:
     - Si la feuille existe déjà, elle est effacée et réutilisée
     - Si la feuille n'existe pas, elle est créée à la fin du classeur
+    - Pour un classeur openpyxl en écriture seule, une nouvelle feuille est créée
     
     Paramètres:
     -----------
-    wb : xw.Book
+    wb : xw.Book ou openpyxl.Workbook
         Classeur Excel
     sheet_name : str
         Nom de la feuille à récupérer ou créer
         
     Retourne:
     ---------
-    xw.Sheet
+    xw.Sheet ou feuille openpyxl
         Objet feuille Excel (nettoyée)
     """
+    # ===== Classeur openpyxl (write_only): le fichier est neuf, rien à nettoyer =====
+    if hasattr(wb, "create_sheet"):
+        return wb.create_sheet(sheet_name)
+
     try:
         # Tentative de récupération de la feuille existante
         sheet = wb.sheets[sheet_name]
@@ -46,323 +98,172 @@ def _get_or_create_sheet(wb, sheet_name):
     return sheet
 
 
-def _afficher_prix_si(arbre, wb):
+def _valeurs_champ(arbre, attr, idx):
     """
-    Affiche les prix du sous-jacent (si) dans la feuille 'Py_Prix_SI'.
-    
-    Cette fonction parcourt l'arbre trinomial et écrit le prix du sous-jacent
-    à chaque nœud dans Excel. L'affichage est organisé en colonnes (étapes temporelles)
-    et en lignes (niveaux de prix).
-    
-    Structure de l'affichage:
-    -------------------------
-    - Chaque colonne = une étape temporelle (de 0 à N)
-    - Chaque ligne = un niveau de prix
-    - La ligne du milieu (N) correspond au tronc de l'arbre
-    - Les lignes au-dessus correspondent aux nœuds up
-    - Les lignes en-dessous correspondent aux nœuds down
+    Valeurs d'un attribut des nœuds d'indices plats idx, lues dans les tableaux
+    de l'arbre avec la même convention que Node (NaN là où Node renvoie None).
     
     Paramètres:
     -----------
     arbre : Arbre
         Arbre trinomial construit
-    wb : xw.Book
-        Classeur Excel
+    attr : str
+        Nom de l'attribut ("si", "si2", "p_up", "p_mid", "p_down", "proba_cumule")
+    idx : np.ndarray
+        Indices plats des nœuds
     """
-    # ===== Récupération ou création de la feuille =====
-    ws = _get_or_create_sheet(wb, "Py_Prix_SI")
-    
-    # ===== Calcul du nombre de colonnes =====
-    N = arbre.n_steps + 1  
-    
-    # ===== Point de départ: nœud du milieu à chaque étape =====
-    node_mid = arbre.racine
+    values = getattr(arbre, "_" + attr)[idx]
+    if attr in ("p_up", "p_down"):
+        # Nœud pruné: pas de branche up/down (la maturité est déjà NaN)
+        values = np.where(arbre._pruned[idx], np.nan, values)
+    return values
 
-    for k in range(N):
-        # --- Affichage du nœud du milieu ---
-        ws.range("A1").offset(N, k).value = node_mid.si
-        
-        # --- Remontée: affichage des nœuds au-dessus du milieu ---
-        node = node_mid.voisin_up
-        i = 1  # Compteur de distance par rapport au milieu
-        while node is not None:
-            ws.range("A1").offset(N - i, k).value = node.si
-            i += 1
-            node = node.voisin_up
-        
-        # --- Descente: affichage des nœuds en-dessous du milieu ---
-        node = node_mid.voisin_down
-        i = 1  # Compteur de distance par rapport au milieu
-        while node is not None:
-            ws.range("A1").offset(N + i, k).value = node.si
-            i += 1
-            node = node.voisin_down
-        
-        # --- Passage à l'étape suivante ---
-        node_mid = node_mid.next_mid
-    
-    # ===== Ajout d'un label explicatif =====
-    ws.range("A1").offset(N, N + 2).value = "Prix du Sous-Jacent (si)"
 
-
-def _afficher_prix_option(arbre, wb):
-    """
-    Affiche les prix de l'option (si2) dans la feuille 'Py_Prix_Option'.
-    
-    Cette fonction affiche les valeurs de l'option calculées lors du backward pricing.
-    La structure est identique à _afficher_prix_si mais affiche si2 au lieu de si.
-    
-    Paramètres:
-    -----------
-    arbre : Arbre
-        Arbre trinomial avec pricing effectué (si2 calculé)
-    wb : xw.Book
-        Classeur Excel
+def _collect_all_fields(arbre, attrs):
     """
-    ws = _get_or_create_sheet(wb, "Py_Prix_Option")
-    N = arbre.n_steps + 1
-    node_mid = arbre.racine
-
-    for k in range(N):
-        # Affichage du prix de l'option au nœud mid
-        ws.range("A1").offset(N, k).value = node_mid.si2
-        
-        # Remontée: nœuds up
-        node = node_mid.voisin_up
-        i = 1
-        while node is not None:
-            ws.range("A1").offset(N - i, k).value = node.si2
-            i += 1
-            node = node.voisin_up
-        
-        # Descente: nœuds down
-        node = node_mid.voisin_down
-        i = 1
-        while node is not None:
-            ws.range("A1").offset(N + i, k).value = node.si2
-            i += 1
-            node = node.voisin_down
-        
-        node_mid = node_mid.next_mid
+    Rassemble, pour chaque attribut demandé, les valeurs des nœuds dans une grille 2D.
     
-    ws.range("A1").offset(N, N + 2).value = "Prix de l'Option (si2)"
-
-
-def _afficher_proba_up(arbre, wb):
-    """
-    Affiche les probabilités de transition vers le haut (p_up) dans 'Py_Proba_Up'.
+    Aucun nœud n'est parcouru: la position de chaque nœud dans la grille se déduit
+    des tableaux de l'arbre (colonne k = [_debut[k], _debut[k+1]), tronc en _tronc[k]).
+    Chaque grille est remplie en une opération NumPy, puis écrite dans Excel en un
+    seul appel.
     
-    p_up représente la probabilité risque-neutre de passer d'un nœud à son nœud
-    suivant vers le haut (next_up).
+    Structure des grilles:
+    ----------------------
+    - Chaque colonne = une étape temporelle (de 0 à N)
+    - La ligne N correspond au tronc de l'arbre (décalée vers le bas si un
+      dividende élargit l'arbre au-dessus du tronc)
+    - Les lignes au-dessus correspondent aux nœuds up, celles en-dessous aux nœuds down
     
     Paramètres:
     -----------
     arbre : Arbre
         Arbre trinomial construit
-    wb : xw.Book
-        Classeur Excel
-    """
-    ws = _get_or_create_sheet(wb, "Py_Proba_Up")
-    N = arbre.n_steps + 1
-    node_mid = arbre.racine
-
-    for k in range(N):
-        ws.range("A1").offset(N, k).value = node_mid.p_up
-        
-        node = node_mid.voisin_up
-        i = 1
-        while node is not None:
-            ws.range("A1").offset(N - i, k).value = node.p_up
-            i += 1
-            node = node.voisin_up
+    attrs : iterable of str
+        Noms des attributs des nœuds à rassembler ("si", "si2", "p_up", ...)
         
-        node = node_mid.voisin_down
-        i = 1
-        while node is not None:
-            ws.range("A1").offset(N + i, k).value = node.p_up
-            i += 1
-            node = node.voisin_down
-        
-        node_mid = node_mid.next_mid
-    
-    ws.range("A1").offset(N, N + 2).value = "Proba Up (p_up)"
-
-
-def _afficher_proba_mid(arbre, wb):
-    """
-    Affiche les probabilités de transition vers le milieu (p_mid) dans 'Py_Proba_Mid'.
-    
-    p_mid représente la probabilité risque-neutre de passer d'un nœud à son nœud
-    suivant au milieu (next_mid).
-
-    Paramètres:
-    -----------
-    arbre : Arbre
-        Arbre trinomial construit
-    wb : xw.Book
-        Classeur Excel
+    Retourne:
+    ---------
+    tuple (dict[str, np.ndarray], int)
+        Grille float64 (lignes × colonnes) par attribut, NaN pour les cellules vides,
+        et ligne du tronc dans les grilles
     """
-    ws = _get_or_create_sheet(wb, "Py_Proba_Mid")
+    # ===== Calcul du nombre de colonnes =====
     N = arbre.n_steps + 1
-    node_mid = arbre.racine
-
-    for k in range(N):
-        ws.range("A1").offset(N, k).value = node_mid.p_mid
-        
-        node = node_mid.voisin_up
-        i = 1
-        while node is not None:
-            ws.range("A1").offset(N - i, k).value = node.p_mid
-            i += 1
-            node = node.voisin_up
-        
-        node = node_mid.voisin_down
-        i = 1
-        while node is not None:
-            ws.range("A1").offset(N + i, k).value = node.p_mid
-            i += 1
-            node = node.voisin_down
-        
-        node_mid = node_mid.next_mid
     
-    ws.range("A1").offset(N, N + 2).value = "Proba Mid (p_mid)"
-
-
-def _afficher_proba_down(arbre, wb):
+    # ===== Position de chaque nœud dans la grille =====
+    idx = np.arange(arbre._debut[N])
+    cols = np.repeat(np.arange(N), np.diff(arbre._debut))
+    # Distance au tronc: positive au-dessus (prix plus élevé), négative en-dessous
+    rows = N - (idx - arbre._tronc[cols])
+
+    # Un dividende peut élargir l'arbre au-dessus du tronc: tout est décalé vers
+    # le bas pour qu'aucun indice de ligne ne soit négatif
+    decalage = max(0, -int(rows.min()))
+    rows += decalage
+    ligne_tronc = N + decalage
+    
+    # ===== Remplissage des grilles =====
+    # ... ou en-dessous du tronc: la grille s'agrandit dans les deux sens si besoin
+    n_rows = max(ligne_tronc + N + 1, int(rows.max()) + 1)
+    grids = {}
+    for attr in attrs:
+        grid = np.full((n_rows, N), np.nan)
+        grid[rows, cols] = _valeurs_champ(arbre, attr, idx)
+        grids[attr] = grid
+    return grids, ligne_tronc
+
+
+def _ecrire_grille(ws, grid, N, titre, ligne_tronc):
     """
-    Affiche les probabilités de transition vers le bas (p_down) dans 'Py_Proba_Down'.
+    Écrit une grille et son titre dans la feuille en un seul appel Excel.
     
-    p_down représente la probabilité risque-neutre de passer d'un nœud à son nœud
-    suivant vers le bas (next_down).
+    Le titre est placé sur la ligne du tronc, deux colonnes après la grille:
+    la grille est complétée par 3 colonnes (vides sauf le titre) pour former
+    un bloc rectangulaire écrit d'un coup à partir de A1. Pour une feuille
+    openpyxl en écriture seule, le bloc est écrit ligne par ligne (flux XML).
     
     Paramètres:
     -----------
-    arbre : Arbre
-        Arbre trinomial construit
-    wb : xw.Book
-        Classeur Excel
+    ws : xw.Sheet ou feuille openpyxl
+        Feuille cible (déjà nettoyée)
+    grid : np.ndarray
+        Grille des valeurs, NaN pour les cellules vides (non modifiée: elle peut
+        servir à plusieurs feuilles)
+    N : int
+        Nombre de colonnes de la grille (n_steps + 1)
+    titre : str
+        Titre affiché à droite du tronc
+    ligne_tronc : int
+        Ligne du tronc dans la grille (voir _collect_all_fields)
     """
-    ws = _get_or_create_sheet(wb, "Py_Proba_Down")
-    N = arbre.n_steps + 1
-    node_mid = arbre.racine
-
-    for k in range(N):
-        ws.range("A1").offset(N, k).value = node_mid.p_down
-        
-        node = node_mid.voisin_up
-        i = 1
-        while node is not None:
-            ws.range("A1").offset(N - i, k).value = node.p_down
-            i += 1
-            node = node.voisin_up
-        
-        node = node_mid.voisin_down
-        i = 1
-        while node is not None:
-            ws.range("A1").offset(N + i, k).value = node.p_down
-            i += 1
-            node = node.voisin_down
-        
-        node_mid = node_mid.next_mid
-    
-    ws.range("A1").offset(N, N + 2).value = "Proba Down (p_down)"
+    # Cellules vides: None (cellule laissée vide dans Excel)
+    bloc = np.full((grid.shape[0], N + 3), None, dtype=object)
+    bloc[:, :N] = np.where(np.isnan(grid), None, grid)
+    bloc[ligne_tronc, N + 2] = titre
+    if hasattr(ws, "append"):
+        for ligne in bloc.tolist():
+            ws.append(ligne)
+    else:
+        ws.range("A1").value = bloc.tolist()
 
 
-def _afficher_proba_cumule(arbre, wb):
+def _afficher_feuille(arbre, wb, sheet_name, titre, grid, ligne_tronc):
     """
-    Affiche les probabilités cumulées dans la feuille 'Py_Proba_Cumulee'.
+    Écrit une grille déjà rassemblée (voir _collect_all_fields) dans sa feuille.
+    
+    La feuille est créée ou nettoyée, puis la grille et son titre sont écrits
+    en un seul appel par _ecrire_grille. Pour 'Py_Variance', la grille reçue est
+    celle des prix du sous-jacent et la variance en est déduite:
     
-    La probabilité cumulée d'un nœud représente la probabilité totale d'atteindre
-    ce nœud depuis la racine en suivant tous les chemins possibles.
+    Var(S) = S² × exp(2r×dt) × [exp(σ²×dt) - 1]
     
     Paramètres:
     -----------
     arbre : Arbre
-        Arbre trinomial construit avec probabilités propagées
-    wb : xw.Book
-        Classeur Excel
+        Arbre trinomial construit et pricé
+    wb : xw.Book ou openpyxl.Workbook
+        Classeur cible
+    sheet_name, titre : str
+        Nom de la feuille et titre affiché à droite du tronc (voir SHEET_TABLE)
+    grid : np.ndarray
+        Grille de l'attribut lu pour cette feuille (non modifiée)
+    ligne_tronc : int
+        Ligne du tronc dans la grille
     """
-    ws = _get_or_create_sheet(wb, "Py_Proba_Cumulee")
-    N = arbre.n_steps + 1
-    node_mid = arbre.racine
+    if sheet_name == "Py_Variance":
+        # Facteur constant calculé une fois par l'arbre; nouvelle grille, celle
+        # des prix peut aussi servir à la feuille Py_Prix_SI (les vides restent NaN)
+        grid = arbre._facteur_var * grid * grid
 
-    for k in range(N):
-        ws.range("A1").offset(N, k).value = node_mid.proba_cumule
-        
-        node = node_mid.voisin_up
-        i = 1
-        while node is not None:
-            ws.range("A1").offset(N - i, k).value = node.proba_cumule
-            i += 1
-            node = node.voisin_up
-        
-        node = node_mid.voisin_down
-        i = 1
-        while node is not None:
-            ws.range("A1").offset(N + i, k).value = node.proba_cumule
-            i += 1
-            node = node.voisin_down
-        
-        node_mid = node_mid.next_mid
-    
-    ws.range("A1").offset(N, N + 2).value = "Proba Cumulée"
+    ws = _get_or_create_sheet(wb, sheet_name)
+    _ecrire_grille(ws, grid, arbre.n_steps + 1, titre, ligne_tronc)
 
 
-def _afficher_variance(arbre, wb):
+def _afficher_feuilles(arbre, wb, sheets_to_create):
     """
-    Calcule et affiche la variance à chaque nœud dans la feuille 'Py_Variance'.
-    
-    La variance représente la dispersion du prix du sous-jacent autour de sa valeur
-    forward à l'étape suivante. Elle est calculée selon la formule:
-    
-    Var(S) = S² × exp(2r×dt) × [exp(σ²×dt) - 1]
+    Crée ou met à jour les feuilles demandées à partir des tableaux de l'arbre.
     
     Paramètres:
     -----------
     arbre : Arbre
-        Arbre trinomial construit
-    wb : xw.Book
-        Classeur Excel
+        Arbre trinomial construit et pricé
+    wb : xw.Book ou openpyxl.Workbook
+        Classeur cible
+    sheets_to_create : frozenset of str
+        Noms des feuilles à écrire (voir ALL_PY_SHEETS)
     """
-    ws = _get_or_create_sheet(wb, "Py_Variance")
-    N = arbre.n_steps + 1
-    node_mid = arbre.racine
-    
-    # ===== Récupération des paramètres pour le calcul =====
-    r = arbre.market.int_rate    # Taux d'intérêt 
-    dt = arbre.dt                # Pas de temps
-    sigma = arbre.market.sigma   # Volatilité
-
-    # ===== Boucle sur les étapes temporelles =====
-    for k in range(N):
-        # --- Calcul de la variance pour le nœud mid ---
-        value = (node_mid.si ** 2) * math.exp(2 * r * dt) * (math.exp(sigma**2 * dt) - 1)
-        ws.range("A1").offset(N, k).value = value
-        
-        # --- Remontée: nœuds up ---
-        node = node_mid.voisin_up
-        i = 1
-        while node is not None:
-            value = (node.si ** 2) * math.exp(2 * r * dt) * (math.exp(sigma**2 * dt) - 1)
-            ws.range("A1").offset(N - i, k).value = value
-            i += 1
-            node = node.voisin_up
-        
-        # --- Descente: nœuds down ---
-        node = node_mid.voisin_down
-        i = 1
-        while node is not None:
-            value = (node.si ** 2) * math.exp(2 * r * dt) * (math.exp(sigma**2 * dt) - 1)
-            ws.range("A1").offset(N + i, k).value = value
-            i += 1
-            node = node.voisin_down
-        
-        node_mid = node_mid.next_mid
+    # ===== Parcours unique de l'arbre pour toutes les feuilles demandées =====
+    if sheets_to_create:
+        grids, ligne_tronc = _collect_all_fields(arbre, {SHEET_FIELDS[name] for name in sheets_to_create})
     
-    ws.range("A1").offset(N, N + 2).value = "Variance"
+    # ===== Création/mise à jour des feuilles demandées =====
+    for sheet_name, titre, champ in SHEET_TABLE:
+        if sheet_name in sheets_to_create:
+            _afficher_feuille(arbre, wb, sheet_name, titre, grids[champ], ligne_tronc)
 
 
-def gerer_affichage_granulaire(arbre, affichage_str):
+def gerer_affichage_granulaire(arbre, affichage_str, out_xlsx=None):
     """
     Fonction principale de gestion de l'affichage granulaire de l'arbre dans Excel.
     
@@ -381,17 +282,28 @@ def gerer_affichage_granulaire(arbre, affichage_str):
     - "variance": Affiche seulement la variance
     - Autre/None: Nettoie toutes les feuilles Python sans rien afficher
 
+    Si out_xlsx est fourni, Excel n'est pas utilisé: les feuilles demandées sont
+    écrites dans un nouveau fichier via openpyxl en mode écriture seule (pas
+    d'aller-retour COM), utile pour un pricing en batch sans classeur ouvert.
+
     Paramètres:
     -----------
     arbre : Arbre
         Arbre trinomial construit et pricé
     affichage_str : str
         Mode d'affichage demandé ("all", "prix", "proba", "variance", etc.)
+    out_xlsx : str, optional
+        Chemin du fichier .xlsx à écrire à la place du classeur appelant
+
+    Lève:
+    -----
+    ValueError
+        Si l'arbre n'est pas trinomial (method="LR")
     """
-    # ===== Connexion au classeur Excel =====
-    wb = xw.Book.caller()
-    app = wb.app
-    
+    # L'arbre de Leisen-Reimer n'a pas de nœuds à afficher
+    if arbre.method != "trinomial":
+        raise ValueError("gerer_affichage_granulaire nécessite un arbre trinomial")
+
     # ===== Normalisation de la demande d'affichage =====
     affichage_lower = str(affichage_str).lower()
     sheets_to_create = []  
@@ -399,7 +311,7 @@ def gerer_affichage_granulaire(arbre, affichage_str):
     # ===== Détermination des feuilles à créer selon la demande =====
     if affichage_lower == "all":
         # Mode ALL: toutes les feuilles
-        sheets_to_create = ALL_PY_SHEETS
+        sheets_to_create = list(SHEET_FIELDS)
     
     elif affichage_lower == "prix":
         # Mode PRIX: seulement les prix du sous-jacent et de l'option
@@ -414,48 +326,46 @@ def gerer_affichage_granulaire(arbre, affichage_str):
         sheets_to_create = ["Py_Variance"]
     
     # Si affichage_lower ne correspond à aucun mode, sheets_to_create reste vide
+    demandees = frozenset(sheets_to_create)  # Tests d'appartenance en O(1)
 
-    # ===== Désactivation des mises à jour Excel =====
-    app.api.ScreenUpdating = False     # Pas de rafraîchissement d'écran
-    app.api.Calculation = -4135        # xlCalculationManual: calcul manuel
-    app.api.EnableEvents = False       # TRÈS IMPORTANT avant de supprimer des feuilles
+    if out_xlsx is not None:
+        # ===== Écriture hors Excel: nouveau classeur openpyxl en flux =====
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
 
-    print(f"Demande d'affichage : '{affichage_lower}'. Feuilles à créer : {sheets_to_create}")
-
-    # ===== Nettoyage: suppression des feuilles non demandées =====
-    for sheet in wb.sheets:
-        if sheet.name in ALL_PY_SHEETS and sheet.name not in sheets_to_create:
-            print(f"Suppression de(s) feuille(s) : {sheet.name}")
-            sheet.delete()
-    
-    # ===== Création/mise à jour des feuilles demandées =====
-    if "Py_Prix_SI" in sheets_to_create:
-        _afficher_prix_si(arbre, wb)
-    
-    if "Py_Prix_Option" in sheets_to_create:
-        _afficher_prix_option(arbre, wb)
-    
-    if "Py_Proba_Up" in sheets_to_create:
-        _afficher_proba_up(arbre, wb)
-    
-    if "Py_Proba_Mid" in sheets_to_create:
-        _afficher_proba_mid(arbre, wb)
-    
-    if "Py_Proba_Down" in sheets_to_create:
-        _afficher_proba_down(arbre, wb)
-    
-    if "Py_Proba_Cumulee" in sheets_to_create:
-        _afficher_proba_cumule(arbre, wb)
-    
-    if "Py_Variance" in sheets_to_create:
-        _afficher_variance(arbre, wb)
+        logger.debug("Demande d'affichage : '%s'. Feuilles à écrire dans %s : %s",
+                     affichage_lower, out_xlsx, sheets_to_create)
+        _afficher_feuilles(arbre, wb, demandees)
 
-    # ===== Réactivation des mises à jour Excel =====
-    app.api.Calculation = -4105        # xlCalculationAutomatic: calcul automatique
-    app.api.EnableEvents = True        # Réactivation des événements
-    app.api.ScreenUpdating = True      # Réactivation du rafraîchissement d'écran
+        # ===== Enregistrement du fichier (un classeur vide n'est pas valide) =====
+        if sheets_to_create:
+            wb.save(out_xlsx)
+    else:
+        # ===== Connexion au classeur Excel =====
+        wb = xw.Book.caller()
+
+        # ===== Mises à jour Excel suspendues pour tout le bloc d'écritures =====
+        with _excel_batch(wb.app):
+            logger.debug("Demande d'affichage : '%s'. Feuilles à créer : %s",
+                         affichage_lower, sheets_to_create)
+
+            # ===== Nettoyage: suppression des feuilles non demandées =====
+            to_delete = [sheet.name for sheet in wb.sheets
+                         if sheet.name in ALL_PY_SHEETS and sheet.name not in demandees]
+            if to_delete:
+                logger.debug("Suppression de(s) feuille(s) : %s", to_delete)
+                if sys.platform == "win32" and not wb.app.display_alerts:
+                    # Toutes les feuilles en un seul appel COM: Worksheets(Array(...)).Delete
+                    # (sans alertes, aucune boîte de confirmation ne bloque la suppression)
+                    wb.api.Worksheets(to_delete).Delete()
+                else:
+                    # macOS (api appscript) ou alertes actives: une feuille à la fois
+                    for name in to_delete:
+                        wb.sheets[name].delete()
+
+            _afficher_feuilles(arbre, wb, demandees)
     
     if sheets_to_create:
-        print("Affichage terminé.")
+        logger.debug("Affichage terminé.")
     else:
-        print("Nettoyage des feuilles terminé. Aucun affichage demandé.")
\ No newline at end of file
+        logger.debug("Nettoyage des feuilles terminé. Aucun affichage demandé.")
\ No newline at end of file
@@ -0,0 +1,322 @@
+"""
+Noyaux numériques compilés (Numba) pour la construction et le pricing de l'arbre trinomial.
+
+Les fonctions travaillent directement sur les tableaux plats de l'Arbre
+(colonne k dans [debut[k], debut[k+1])). Si Numba n'est pas installé,
+NUMBA_DISPONIBLE vaut False et la construction comme le pricing retombent
+sur les versions NumPy.
+
+Les boucles restent séquentielles (pas de parallel=True / prange): une colonne
+prunée compte au plus quelques centaines de nœuds, trop peu pour amortir la
+synchronisation des threads à chaque étape, et le parcours est limité par la
+bande passante mémoire (une version vectorisée SIMD n'est pas plus rapide).
+Les noyaux relâchent en revanche le GIL (nogil=True): des arbres indépendants
+(grecques) peuvent être construits et pricés en parallèle dans des threads.
+"""
+import math
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_DISPONIBLE = True
+except ImportError:
+    NUMBA_DISPONIBLE = False
+
+    def njit(*args, **kwargs):
+        # Décorateur neutre : les noyaux restent appelables en Python pur
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def backward_european(si2, p_up, p_mid, p_down, next_mid, debut, d_f):
+    """
+    Backward induction d'une option européenne, de la colonne N-1 à la racine.
+
+    Le parcours est limité par la mémoire (chaque nœud n'est lu qu'une fois) et
+    non par le cache: grâce au pruning une colonne compte au plus quelques
+    centaines de nœuds, la colonne k+1 reste donc en L1 pendant le calcul de k.
+    p_mid n'est pas relu: il vaut 1 - p_up - p_down par construction.
+
+    Paramètres:
+    -----------
+    si2 : np.ndarray
+        Prix de l'option (dernière colonne déjà initialisée au payoff), modifié en place
+    p_up, p_mid, p_down : np.ndarray
+        Probabilités de transition de chaque nœud (p_mid gardé pour la signature)
+    next_mid : np.ndarray
+        Indice (plat) du nœud mid suivant de chaque nœud
+    debut : np.ndarray
+        Indice de début de chaque colonne (taille N+2)
+    d_f : float
+        Facteur d'actualisation: exp(-r×dt)
+    """
+    N = debut.size - 2
+    for k in range(N - 1, -1, -1):
+        bas_suivant = debut[k + 1]
+        haut_suivant = debut[k + 2] - 1
+        for i in range(debut[k], debut[k + 1]):
+            m = next_mid[i]
+            # Nœuds prunés: up/down ramenés dans la colonne (probabilité nulle)
+            up = min(m + 1, haut_suivant)
+            down = max(m - 1, bas_suivant)
+            # p_mid = 1 - p_up - p_down (définition de l'arbre): un tableau de moins à lire
+            pu, pd = p_up[i], p_down[i]
+            si2[i] = d_f * (pu * si2[up] + (1.0 - pu - pd) * si2[m] + pd * si2[down])
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def backward_american(si2, si, p_up, p_mid, p_down, next_mid, debut, d_f, K, op_multiplicator):
+    """
+    Backward induction d'une option américaine: même parcours que
+    backward_european, avec comparaison à la valeur d'exercice immédiat.
+
+    Paramètres supplémentaires:
+    ---------------------------
+    si : np.ndarray
+        Prix du sous-jacent de chaque nœud
+    K : float
+        Prix d'exercice (strike)
+    op_multiplicator : int
+        +1 pour Call, -1 pour Put
+    """
+    N = debut.size - 2
+    for k in range(N - 1, -1, -1):
+        bas_suivant = debut[k + 1]
+        haut_suivant = debut[k + 2] - 1
+        for i in range(debut[k], debut[k + 1]):
+            m = next_mid[i]
+            up = min(m + 1, haut_suivant)
+            down = max(m - 1, bas_suivant)
+            pu, pd = p_up[i], p_down[i]
+            val = d_f * (pu * si2[up] + (1.0 - pu - pd) * si2[m] + pd * si2[down])
+            intrinsic = max((si[i] - K) * op_multiplicator, 0.0)
+            si2[i] = max(val, intrinsic)
+
+
+@njit(cache=True, nogil=True)
+def colonne_suivante(si, proba_cumule, j_bas, D, croissance, facteur_var, alpha, alpha_inv,
+                     log_alpha, denom_up, denom_down, p_up_const, p_mid_const, p_down_const, prune_eps,
+                     puissances, j_min):
+    """
+    Construit la colonne k+1 de l'arbre à partir de la colonne k, nœud par nœud
+    (mêmes formules et même ordre d'opérations que la version NumPy de arbre.py).
+
+    Paramètres:
+    -----------
+    si, proba_cumule : np.ndarray
+        Prix et probabilités cumulées de la colonne k (du plus bas au plus haut)
+    j_bas : int
+        Indice relatif (au tronc) du nœud le plus bas de la colonne k
+    D : float
+        Dividende détaché pendant l'étape (0 sinon)
+    croissance, facteur_var, alpha, alpha_inv, log_alpha, denom_up, denom_down : float
+        Constantes de l'arbre
+    p_up_const, p_mid_const, p_down_const : float
+        Probabilités communes à tous les nœuds hors étape de dividende
+    prune_eps : float
+        Seuil de pruning sur la probabilité cumulée
+    puissances : np.ndarray
+        Table alpha^j pour j = j_min, j_min+1, ... (évite un pow par nœud)
+    j_min : int
+        Premier exposant de la table
+
+    Retourne:
+    ---------
+    (si_suivant, pc_suivant, p_up, p_mid, p_down, pruned, pos_mid, j_bas_suivant)
+    """
+    n = si.size
+    forward = si * croissance - D
+    mid_suivant = forward[-j_bas]
+
+    # ===== Recherche des next_mid =====
+    j_next = np.empty(n, dtype=np.int64)
+    for i in range(n):
+        if D == 0:
+            j_next[i] = j_bas + i
+        else:
+            f = forward[i]
+            jn = int(math.ceil(math.log(2 * f / (mid_suivant * (1 + alpha))) / log_alpha))
+            if f > mid_suivant * alpha ** float(jn) * (1 + alpha) / 2:
+                jn += 1
+            if f <= mid_suivant * alpha ** float(jn) * (1 + alpha_inv) / 2:
+                jn -= 1
+            j_next[i] = jn
+
+    # ===== Pruning et bornes de la colonne suivante =====
+    pruned = proba_cumule < prune_eps
+    j_bas_suivant = j_next[0] - (0 if pruned[0] else 1)
+    j_haut_suivant = j_next[n - 1] + (0 if pruned[n - 1] else 1)
+    n_suivant = j_haut_suivant - j_bas_suivant + 1
+    si_suivant = np.empty(n_suivant)
+    for i in range(n_suivant):
+        t = j_bas_suivant + i - j_min
+        if 0 <= t < puissances.size:
+            si_suivant[i] = mid_suivant * puissances[t]
+        else:
+            si_suivant[i] = mid_suivant * alpha ** float(j_bas_suivant + i)
+    pos_mid = j_next - j_bas_suivant
+
+    # ===== Probabilités et propagation des probabilités cumulées =====
+    p_up = np.empty(n)
+    p_mid = np.empty(n)
+    p_down = np.empty(n)
+    pc_mid = np.zeros(n_suivant)
+    pc_up = np.zeros(n_suivant)
+    pc_down = np.zeros(n_suivant)
+    for i in range(n):
+        m = pos_mid[i]
+        if pruned[i]:
+            pu, pm, pd = 0.0, 1.0, 0.0
+        elif D == 0:
+            pu, pm, pd = p_up_const, p_mid_const, p_down_const
+        else:
+            nmv = si_suivant[m]
+            f = forward[i]
+            var = si[i] * si[i] * facteur_var
+            ratio = f / nmv
+            pd = ((var + f * f) / (nmv * nmv) - 1 - (alpha + 1) * (ratio - 1)) / denom_down
+            pu = (ratio - 1 - (alpha_inv - 1) * pd) / denom_up
+            pm = 1 - pu - pd
+        p_up[i], p_mid[i], p_down[i] = pu, pm, pd
+
+        pc = proba_cumule[i]
+        pc_mid[m] += pc * pm
+        if pruned[i]:
+            pc_up[m] += pc * pu
+            pc_down[m] += pc * pd
+        else:
+            pc_up[m + 1] += pc * pu
+            pc_down[m - 1] += pc * pd
+
+    pc_suivant = pc_mid + pc_up + pc_down
+    return si_suivant, pc_suivant, p_up, p_mid, p_down, pruned, pos_mid, j_bas_suivant
+
+
+@njit(cache=True, nogil=True)
+def _agrandir(a, capacite):
+    # Copie de a dans un tableau plus grand (mêmes premières valeurs)
+    b = np.empty(capacite, dtype=a.dtype)
+    b[:a.size] = a
+    return b
+
+
+@njit(cache=True, nogil=True)
+def construire_arbre(S0, N, div_step, div, croissance, facteur_var, alpha, alpha_inv,
+                     log_alpha, denom_up, denom_down, p_up_const, p_mid_const, p_down_const,
+                     prune_eps, puissances, j_min):
+    """
+    Construit toutes les colonnes de l'arbre dans des tableaux plats, en un seul
+    appel compilé (pas de boucle Python ni de concaténation par colonne).
+
+    Paramètres:
+    -----------
+    S0 : float
+        Prix initial du sous-jacent
+    N : int
+        Nombre d'étapes
+    div_step : int
+        Étape de détachement du dividende (-1 si aucune)
+    div : float
+        Montant du dividende
+    Autres paramètres : voir colonne_suivante
+
+    Retourne:
+    ---------
+    (si, proba_cumule, p_up, p_mid, p_down, pruned, next_mid, debut, tronc)
+        Tableaux plats de l'Arbre (colonne k dans [debut[k], debut[k+1]))
+    """
+    # Capacité initiale: colonnes de largeur <= 2k+1, bornées en pratique par le pruning
+    capacite = min((N + 1) * (N + 1), 64 * (N + 1))
+    si_f = np.empty(capacite)
+    pc_f = np.empty(capacite)
+    up_f = np.empty(capacite)
+    mid_f = np.empty(capacite)
+    down_f = np.empty(capacite)
+    pruned_f = np.zeros(capacite, dtype=np.bool_)
+    next_f = np.empty(capacite, dtype=np.int64)
+    debut = np.empty(N + 2, dtype=np.int64)
+    tronc = np.zeros(N + 1, dtype=np.int64)
+
+    # ===== Colonne 0 : la racine =====
+    si = np.full(1, S0)
+    proba_cumule = np.ones(1)
+    j_bas = 0
+    si_f[0] = S0
+    pc_f[0] = 1.0
+    debut[0] = 0
+    debut[1] = 1
+
+    for k in range(N):
+        D = div if k == div_step else 0.0
+        (si_suivant, pc_suivant, p_up, p_mid, p_down,
+         pruned, pos_mid, j_bas_suivant) = colonne_suivante(
+            si, proba_cumule, j_bas, D, croissance, facteur_var, alpha, alpha_inv,
+            log_alpha, denom_up, denom_down, p_up_const, p_mid_const, p_down_const,
+            prune_eps, puissances, j_min)
+
+        # --- Probabilités et liens de la colonne k ---
+        s, e = debut[k], debut[k + 1]
+        up_f[s:e] = p_up
+        mid_f[s:e] = p_mid
+        down_f[s:e] = p_down
+        pruned_f[s:e] = pruned
+        next_f[s:e] = e + pos_mid
+
+        # --- Colonne k+1 (agrandissement des tableaux si nécessaire) ---
+        fin = e + si_suivant.size
+        if fin > capacite:
+            capacite = max(2 * capacite, fin)
+            si_f = _agrandir(si_f, capacite)
+            pc_f = _agrandir(pc_f, capacite)
+            up_f = _agrandir(up_f, capacite)
+            mid_f = _agrandir(mid_f, capacite)
+            down_f = _agrandir(down_f, capacite)
+            pruned_f = _agrandir(pruned_f, capacite)
+            next_f = _agrandir(next_f, capacite)
+        si_f[e:fin] = si_suivant
+        pc_f[e:fin] = pc_suivant
+        tronc[k + 1] = e - j_bas_suivant
+        debut[k + 2] = fin
+
+        si, proba_cumule, j_bas = si_suivant, pc_suivant, j_bas_suivant
+
+    # ===== Dernière colonne (maturité) : pas de transition =====
+    s, total = debut[N], debut[N + 1]
+    up_f[s:total] = np.nan
+    mid_f[s:total] = np.nan
+    down_f[s:total] = np.nan
+    pruned_f[s:total] = False
+    next_f[s:total] = -1
+
+    # Vues sur les tableaux (pas de copie: la capacité non utilisée n'est jamais écrite)
+    return (si_f[:total], pc_f[:total], up_f[:total], mid_f[:total],
+            down_f[:total], pruned_f[:total], next_f[:total], debut, tronc)
+
+
+_prechauffes = False
+
+
+def prechauffer():
+    """
+    Charge (ou compile) les noyaux sur un arbre de 2 étapes.
+
+    Appelé explicitement par les macros qui mesurent un temps de construction
+    (main, elapsed) avant la mesure, et non à l'import: les outils NumPy et les
+    workers des pools de grecques ne paient pas ce chargement. Sans Numba, ou
+    si les noyaux sont déjà chargés, ne fait rien.
+    """
+    global _prechauffes
+    if not NUMBA_DISPONIBLE or _prechauffes:
+        return
+    alpha = math.exp(0.2 * math.sqrt(3 * 0.5))
+    puissances = alpha ** np.arange(-3, 4, dtype=np.float64)
+    (si, _, p_up, p_mid, p_down, _, next_mid, debut, _) = construire_arbre(
+        100.0, 2, -1, 0.0, 1.0, 0.02, alpha, 1.0 / alpha, math.log(alpha),
+        alpha - 1.0, (1.0 - alpha) * (1.0 / (alpha * alpha) - 1.0), 0.25, 0.5, 0.25,
+        1e-8, puissances, -3)
+    si2 = np.zeros(si.size)
+    backward_european(si2, p_up, p_mid, p_down, next_mid, debut, 1.0)
+    backward_american(si2, si, p_up, p_mid, p_down, next_mid, debut, 1.0, 100.0, 1)
+    _prechauffes = True
@@ -10,6 +10,8 @@ class Market:
     - Dividendes 
     """
     
+    __slots__ = ("stock_price", "int_rate", "sigma", "div", "div_date")
+    
     def __init__(self, stock_price, int_rate, sigma, div, div_date):
         """
         Initialise un objet Market avec les paramètres de marché.
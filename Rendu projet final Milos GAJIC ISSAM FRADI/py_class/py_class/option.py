@@ -1,4 +1,8 @@
-import math
+import warnings
+import numpy as np
+
+from .kernels import NUMBA_DISPONIBLE, backward_european, backward_american
+from .lr_tree import price_lr
 
 class Contract:
     """
@@ -10,6 +14,9 @@ class Contract:
     - Deux méthodes de pricing: récursive et itérative (backward induction)
     """
     
+    __slots__ = ("maturity_date", "pricing_date", "maturity", "strike",
+                 "op_type", "op_exercice", "op_multiplicator")
+    
     def __init__(self, pricing_date, maturity_date, strike, op_type=None, op_exercice=None):
         """
         Initialise un contrat d'option.
@@ -40,43 +47,66 @@ class Contract:
         # ===== Multiplicateur pour le calcul du payoff =====
         self.op_multiplicator = 1 if self.op_type == "Call" else -1
 
-    def price_recursively(self, arbre):
+    def price_recursively(self, arbre, recursif=False):
         """
-        Calcule le prix de l'option en utilisant une approche récursive.
-        
-        Méthode de calcul:
-        ------------------
-        - Commence à la racine de l'arbre
-        - Descend récursivement jusqu'aux feuilles (maturité)
-        - Remonte en calculant les valeurs d'espérance actualisée à chaque nœud
-        - Utilise la mémoïsation pour éviter les recalculs
+        Calcule le prix de l'option (obsolète: délègue à price_iteratively).
         
-        Inconvénients:
-        --------------
-        - Potentiellement plus lent pour de très grands arbres
-        - Risque de dépassement de pile (stack overflow) pour N très grand
+        La récursion Python coûte une frame par nœud et est limitée par
+        sys.getrecursionlimit(); par défaut le backward itératif sur les tableaux
+        de l'arbre calcule exactement la même valeur. La version récursive
+        (_recursive_pricer) reste disponible pour vérification croisée.
         
         Paramètres:
         -----------
         arbre : Arbre
             Arbre trinomial construit
+        recursif : bool, optional
+            True pour forcer le parcours récursif depuis la racine (petits arbres uniquement)
             
         Retourne:
         ---------
         float
             Prix de l'option (valeur à la racine)
         """
-        # ===== Calcul du facteur d'actualisation =====
-        discount_factor = math.exp(-arbre.market.int_rate * arbre.dt)
+        if recursif:
+            if arbre.method != "trinomial":
+                raise ValueError("price_recursively(recursif=True) nécessite un arbre trinomial")
+            # Les si2 servent de cache de mémoïsation: on repart d'un arbre vierge
+            arbre._si2.fill(np.nan)
+            # Paramètres du contrat lus une fois et passés en variables locales
+            return self._recursive_pricer(arbre.racine, arbre._df, self.strike,
+                                          self.op_multiplicator, self.op_exercice == "US")
+        warnings.warn("price_recursively est obsolète, utiliser price_iteratively",
+                      DeprecationWarning, stacklevel=2)
+        return self.price_iteratively(arbre)
+
+    @staticmethod
+    def _payoff(si, K, op_multiplicator):
+        """
+        Valeur d'exercice au prix si du sous-jacent.
+        
+        Call: max(0, S - K)
+        Put: max(0, K - S) = max(0, -(S - K))
         
-        # ===== Appel de la fonction récursive depuis la racine =====
-        return self._recursive_pricer(arbre.racine, discount_factor)
+        Paramètres:
+        -----------
+        si : float
+            Prix du sous-jacent
+        K : float
+            Prix d'exercice (strike)
+        op_multiplicator : int
+            +1 pour Call, -1 pour Put
+        """
+        x = (si - K) * op_multiplicator
+        return x if x > 0 else 0
     
-    def _recursive_pricer(self, node, df):
+    def _recursive_pricer(self, node, df, K, op_multiplicator, is_us):
         """
         Fonction récursive interne pour calculer le prix de l'option.
         
-        Cette fonction implémente l'algorithme de backward induction de façon récursive:
+        Cette fonction implémente l'algorithme de backward induction de façon récursive
+        (version pédagogique). Les prix si2 de l'arbre servent de cache de mémoïsation:
+        les vider (arbre._si2.fill(np.nan)) avant un appel depuis la racine.
         
         Algorithme:
         -----------
@@ -95,6 +125,12 @@ class Contract:
             Nœud actuel à évaluer
         df : float
             Facteur d'actualisation: exp(-r×dt)
+        K : float
+            Prix d'exercice (strike)
+        op_multiplicator : int
+            +1 pour Call, -1 pour Put
+        is_us : bool
+            True pour une option américaine
             
         Retourne:
         ---------
@@ -104,15 +140,16 @@ class Contract:
         # ===== Cas 1: Prix déjà calculé =====
         # Évite de recalculer un nœud déjà visité
         # Important pour l'efficacité car plusieurs chemins peuvent mener au même nœud
-        if hasattr(node, 'si2') and node.si2 is not None:
-            return node.si2
+        # (si2 est toujours défini sur un Node: None tant qu'il n'est pas calculé)
+        si2 = node.si2
+        if si2 is not None:
+            return si2
         
         # ===== Cas 2: Nœud terminal (feuille de l'arbre à maturité) =====
-        if node.next_mid is None:
+        next_mid = node.next_mid
+        if next_mid is None:
             # Calcul du payoff terminal à maturité
-            # Call: max(0, S - K)
-            # Put: max(0, K - S) = max(0, -(S - K))
-            payoff = max(0, (node.si - self.strike) * self.op_multiplicator)
+            payoff = self._payoff(node.si, K, op_multiplicator)
             node.si2 = payoff
             return payoff
 
@@ -120,16 +157,18 @@ class Contract:
         
         # --- Calcul de l'espérance des valeurs futures ---
         # Commence avec la contribution du nœud mid (généralement la plus probable)
-        EV = node.p_mid * self._recursive_pricer(node.next_mid, df)
+        EV = node.p_mid * self._recursive_pricer(next_mid, df, K, op_multiplicator, is_us)
 
         # Ajout de la contribution du nœud up (si il existe)
         # Certains nœuds (pruning) peuvent ne pas avoir de branche up
-        if node.next_up is not None:
-            EV += node.p_up * self._recursive_pricer(node.next_up, df)
+        next_up = node.next_up
+        if next_up is not None:
+            EV += node.p_up * self._recursive_pricer(next_up, df, K, op_multiplicator, is_us)
         
         # Ajout de la contribution du nœud down (si il existe)
-        if node.next_down is not None:
-            EV += node.p_down * self._recursive_pricer(node.next_down, df)
+        next_down = node.next_down
+        if next_down is not None:
+            EV += node.p_down * self._recursive_pricer(next_down, df, K, op_multiplicator, is_us)
 
         # --- Actualisation de l'espérance ---
         # Valeur de continuation = valeur présente de l'espérance future
@@ -137,16 +176,16 @@ class Contract:
         continuation_value = df * EV
         
         # ===== Gestion du style d'exercice =====
-        if self.op_exercice == "US":
+        if is_us:
             # **Option américaine**: peut être exercée à tout moment
             # On compare la valeur de continuation avec la valeur d'exercice immédiat
             
             # Valeur intrinsèque = payoff si exercé maintenant
-            intrinsic = max(0, (node.si - self.strike) * self.op_multiplicator)
+            intrinsic = self._payoff(node.si, K, op_multiplicator)
             
             # Décision optimale: max(continuer à détenir, exercer maintenant)
             # Si intrinsic > continuation_value, il est optimal d'exercer
-            node.si2 = max(continuation_value, intrinsic)
+            node.si2 = intrinsic if intrinsic > continuation_value else continuation_value
         else:
             # **Option européenne**: exercice uniquement à maturité
             # Pas de décision d'exercice anticipé
@@ -176,110 +215,138 @@ class Contract:
         Structure du parcours:
         ----------------------
         Pour chaque colonne (de droite à gauche):
-          Pour chaque nœud de la colonne (haut puis bas):
-            Calculer la valeur actualisée
-        
+          Calculer en une seule opération vectorielle (NumPy) les valeurs
+          actualisées de tous les nœuds de la colonne
+
         Paramètres:
         -----------
         arbre : Arbre
-            Arbre trinomial construit
+            Arbre trinomial construit (ou arbre de Leisen-Reimer si method="LR")
         type_option : str, optional
             Surcharge du type d'option (par défaut: utilise arbre.contract.op_type)
             Permet de pricer plusieurs types d'options avec le même arbre
         style_option : str, optional
             Surcharge du style d'exercice (par défaut: utilise arbre.contract.op_exercice)
-            
+
         Retourne:
         ---------
         float
             Prix de l'option (valeur à la racine)
         """
         # ===== Récupération des paramètres de l'arbre et du contrat =====
-        r = arbre.market.int_rate      # Taux d'intérêt sans risque
-        N = arbre.n_steps              # Nombre d'étapes dans l'arbre
-        T = arbre.contract.maturity    # Maturité en années
         K = arbre.contract.strike      # Prix d'exercice (strike)
-        dt = T / N                     # Pas de temps par étape
-        
-        # ===== Calcul du facteur d'actualisation =====
-        d_f = math.exp(-r * dt)
-        
+
+        # ===== Facteur d'actualisation (calculé une fois par l'arbre) =====
+        d_f = arbre._df
+
         # ===== Gestion des surcharges de paramètres =====
         type_op = type_option if type_option is not None else arbre.contract.op_type
         op_exercice = style_option if style_option is not None else arbre.contract.op_exercice
         op_multiplicator = 1 if type_op == "Call" else -1
-        
-        # ===== Positionnement au dernier nœud (feuille la plus à droite) =====
-        last_node = arbre.racine
-        while last_node.next_mid is not None:
-            last_node = last_node.next_mid
+
+        # ===== Arbre de Leisen-Reimer: backward binomial dédié =====
+        if arbre.method == "LR":
+            return price_lr(arbre, K, op_multiplicator, op_exercice)
 
         # ===== Étape 1: Initialisation des payoffs terminaux =====
         # Calcule le payoff à maturité pour tous les nœuds de la dernière colonne
-        self._set_payoff(last_node, K, op_multiplicator)
-        
+        self._set_payoff(arbre, K, op_multiplicator)
+
         # ===== Étape 2: Backward induction =====
         # Remonte colonne par colonne en calculant les valeurs actualisées
-        self._roll_back(last_node, d_f, op_exercice, K, op_multiplicator)
-        
+        self._roll_back(arbre, d_f, op_exercice, K, op_multiplicator)
+
         # ===== Retour du prix à la racine =====
-        return arbre.racine.si2
+        return float(arbre._si2[0])
 
-    def _set_payoff(self, last_node, K, op_multiplicator):
+    def price_with_tree_greeks(self, arbre):
         """
-        Initialise les payoffs terminaux à la maturité pour tous les nœuds de la dernière colonne.
+        Calcule le prix, le delta et le gamma de l'option en un seul pricing.
         
-        Cette méthode parcourt tous les nœuds de la dernière étape (maturité) et calcule
-        leur payoff selon le type d'option:
+        Après la backward induction, les trois nœuds de la colonne 1 portent
+        déjà les valeurs de l'option pour trois prix du sous-jacent: delta et
+        gamma s'en déduisent par différences finies sur l'arbre lui-même, sans
+        reconstruire d'arbre choqué.
         
+        Formules (nœuds down, mid, up de la colonne 1):
+        -----------------------------------------------
+        Delta = (V_up - V_down) / (S_up - S_down)
+        Gamma = [(V_up - V_mid) / (S_up - S_mid) - (V_mid - V_down) / (S_mid - S_down)]
+                / ((S_up - S_down) / 2)
+        
+        Paramètres:
+        -----------
+        arbre : Arbre
+            Arbre trinomial construit (au moins une étape)
+            
+        Retourne:
+        ---------
+        tuple[float, float, float]
+            (prix, delta, gamma)
+        """
+        if arbre.method != "trinomial":
+            raise ValueError("price_with_tree_greeks nécessite un arbre trinomial")
+
+        price = self.price_iteratively(arbre)
+
+        # ===== Colonne 1: les trois nœuds issus de la racine (du plus bas au plus haut) =====
+        s, e = arbre._debut[1], arbre._debut[2]
+        S_down, S_mid, S_up = arbre._si[s:e].tolist()
+        V_down, V_mid, V_up = arbre._si2[s:e].tolist()
+
+        delta = (V_up - V_down) / (S_up - S_down)
+        gamma = ((V_up - V_mid) / (S_up - S_mid) - (V_mid - V_down) / (S_mid - S_down)) \
+            / ((S_up - S_down) / 2)
+
+        return price, delta, gamma
+
+    def _set_payoff(self, arbre, K, op_multiplicator):
+        """
+        Initialise les payoffs terminaux à la maturité pour tous les nœuds de la dernière colonne.
+
         Formules du payoff:
         -------------------
-        - **Call**: max(0, S - K) 
+        - **Call**: max(0, S - K)
           → Profit si le sous-jacent est au-dessus du strike
         - **Put**: max(0, K - S)
           → Profit si le sous-jacent est en-dessous du strike
-        
-        Le parcours se fait en deux phases:
-        1. Remontée: depuis last_node vers le haut (voisin_up)
-        2. Descente: depuis last_node vers le bas (voisin_down)
-        
+
+        La dernière colonne est contiguë dans les tableaux de l'arbre: le payoff
+        est calculé en une seule opération vectorielle.
+
         Paramètres:
         -----------
-        last_node : Node
-            Nœud du milieu de la dernière colonne (étape N)
+        arbre : Arbre
+            Arbre trinomial construit
         K : float
             Prix d'exercice (strike)
         op_multiplicator : int
             +1 pour Call, -1 pour Put
         """
-        # ===== Remontée: calcul des payoffs pour les nœuds au-dessus =====
-        current_node = last_node
-        while current_node is not None:
-            current_node.si2 = max((current_node.si - K) * op_multiplicator, 0)
-            current_node = current_node.voisin_up
-        
-        # ===== Descente: calcul des payoffs pour les nœuds en-dessous =====
-        current_node = last_node
-        while current_node is not None:
-            current_node.si2 = max((current_node.si - K) * op_multiplicator, 0)
-            current_node = current_node.voisin_down
+        debut = arbre._debut[arbre.n_steps]
+        arbre._si2[debut:] = np.maximum((arbre._si[debut:] - K) * op_multiplicator, 0)
 
-    def _roll_back(self, last_node, d_f, op_exercice, K, op_multiplicator):
+    def _roll_back(self, arbre, d_f, op_exercice, K, op_multiplicator):
         """
         Remonte dans l'arbre en calculant les valeurs d'option par backward induction.
-        
+
         Cette méthode implémente l'algorithme de backward induction:
-        
-        Pour chaque colonne (de droite à gauche):
-            Pour chaque nœud de la colonne:
-                1. Calculer l'espérance des valeurs futures
-                2. Actualiser cette espérance
-                3. Pour option américaine: comparer avec exercice immédiat
-        
+
+        Pour chaque colonne (de droite à gauche), sur toute la colonne à la fois:
+            1. Calculer l'espérance des valeurs futures
+            2. Actualiser cette espérance
+            3. Pour option américaine: comparer avec exercice immédiat
+
+        Les nœuds prunés ont p_up = p_down = 0 et p_mid = 1: la formule générale
+        se réduit alors à la valeur du nœud mid suivant actualisée.
+
+        Si Numba est disponible, la boucle est déléguée aux noyaux compilés de
+        kernels.py; sinon chaque colonne est traitée en une opération NumPy.
+
         Paramètres:
         -----------
-        last_node : Node
-            Nœud du milieu de la dernière colonne
+        arbre : Arbre
+            Arbre trinomial construit
         d_f : float
             Facteur d'actualisation: exp(-r×dt)
         op_exercice : str
@@ -289,77 +356,50 @@ class Contract:
         op_multiplicator : int
             +1 pour Call, -1 pour Put
         """
+        si, si2, debut = arbre._si, arbre._si2, arbre._debut
+
+        # ===== Noyaux compilés (Numba) =====
+        if NUMBA_DISPONIBLE:
+            if op_exercice == "US":
+                backward_american(si2, si, arbre._p_up, arbre._p_mid, arbre._p_down,
+                                  arbre._next_mid, debut, d_f, float(K), op_multiplicator)
+            else:
+                backward_european(si2, arbre._p_up, arbre._p_mid, arbre._p_down,
+                                  arbre._next_mid, debut, d_f)
+            return
+
+        # ===== Tableaux et style d'exercice lus une fois, hors de la boucle =====
+        p_up, p_mid, p_down = arbre._p_up, arbre._p_mid, arbre._p_down
+        next_mid = arbre._next_mid
+        is_us = op_exercice == "US"
+        minimum, maximum = np.minimum, np.maximum
+
+        # ===== Valeur d'exercice immédiat de tous les nœuds, en une opération =====
+        # (les prix si sont fixes: inutile de la recalculer colonne par colonne)
+        if is_us:
+            intrinsic = maximum((si - K) * op_multiplicator, 0)
+
         # ===== Boucle principale: parcours backward des colonnes =====
-        # Remonte de la dernière colonne vers la racine
-        while last_node is not None:
-            # Passage à la colonne précédente (vers la gauche)
-            last_node = last_node.voisin_behind
-            
-            # ===== Traitement de la branche HAUTE (nœuds au-dessus du milieu) =====
-            current_node = last_node
-            while current_node is not None:
-                
-                # --- Calcul de l'espérance actualisée ---
-                if current_node.p_up == None:
-                    # **Cas particulier: pruning activé**
-                    # Le nœud n'a pas de probabilités calculées (branche peu probable)
-                    # On utilise simplement la valeur du nœud mid suivant actualisée
-                    val = current_node.next_mid.si2 * d_f
-                else:
-                    # **Cas général: calcul de l'espérance complète**
-                    # E[V] = p_up × V_up + p_mid × V_mid + p_down × V_down
-                    u = current_node.p_up
-                    pm = current_node.p_mid
-                    d = current_node.p_down
-                    
-                    # Calcul de l'espérance pondérée et actualisation
-                    val = (u * current_node.next_mid.voisin_up.si2 +
-                           pm * current_node.next_mid.si2 +
-                           d * current_node.next_mid.voisin_down.si2) * d_f
-                
-                # --- Gestion du style d'exercice ---
-                if op_exercice == "US":
-                    # **Option américaine**: possibilité d'exercice anticipé
-                    # Calculer la valeur intrinsèque (exercice immédiat)
-                    intrinsic = max((current_node.si - K) * op_multiplicator, 0)
-                    
-                    # Décision optimale: max(continuer, exercer)
-                    # Si intrinsic > val, il est optimal d'exercer maintenant
-                    current_node.si2 = max(val, intrinsic)
-                else:
-                    # **Option européenne**: pas d'exercice anticipé
-                    # On garde simplement la valeur de continuation
-                    current_node.si2 = val
-                
-                # Passage au nœud supérieur
-                current_node = current_node.voisin_up
-            
-            # ===== Traitement de la branche BASSE (nœuds en-dessous du milieu) =====
-            # Même logique que pour la branche haute
-            current_node = last_node
-            while current_node is not None:
-                
-                # --- Calcul de l'espérance actualisée ---
-                if current_node.p_up == None:
-                    # Cas pruning
-                    val = current_node.next_mid.si2 * d_f
-                else:
-                    # Cas général
-                    u = current_node.p_up
-                    pm = current_node.p_mid
-                    d = current_node.p_down
-                    val = (u * current_node.next_mid.voisin_up.si2 +
-                           pm * current_node.next_mid.si2 +
-                           d * current_node.next_mid.voisin_down.si2) * d_f
-                
-                # --- Gestion du style d'exercice ---
-                if op_exercice == "US":
-                    # Option américaine
-                    intrinsic = max((current_node.si - K) * op_multiplicator, 0)
-                    current_node.si2 = max(val, intrinsic)
-                else:
-                    # Option européenne
-                    current_node.si2 = val
-                
-                # Passage au nœud inférieur
-                current_node = current_node.voisin_down
\ No newline at end of file
+        for k in range(arbre.n_steps - 1, -1, -1):
+            s, e = debut[k], debut[k + 1]
+
+            # --- Indices des nœuds suivants (bornés à la colonne k+1) ---
+            # Pour un nœud pruné, up/down peuvent sortir de la colonne: leur
+            # probabilité est nulle, on les ramène simplement dans les bornes
+            mid = next_mid[s:e]
+            up = minimum(mid + 1, debut[k + 2] - 1)
+            down = maximum(mid - 1, e)
+
+            # --- Calcul de l'espérance actualisée ---
+            # E[V] = p_up × V_up + p_mid × V_mid + p_down × V_down
+            val = (p_up[s:e] * si2[up] +
+                   p_mid[s:e] * si2[mid] +
+                   p_down[s:e] * si2[down]) * d_f
+
+            # --- Gestion du style d'exercice ---
+            if is_us:
+                # **Option américaine**: max(continuer, exercer)
+                si2[s:e] = maximum(val, intrinsic[s:e])
+            else:
+                # **Option européenne**: valeur de continuation
+                si2[s:e] = val
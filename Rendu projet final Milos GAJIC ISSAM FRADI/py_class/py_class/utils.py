@@ -1,38 +1,131 @@
+import math
+import os
 import numpy as np 
-from scipy.stats import norm
+from scipy.special import ndtr
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
 from typing import Callable, cast
 
 
 from .arbre import Arbre
 from .option import Contract
 from .market import Market
+from .kernels import NUMBA_DISPONIBLE
 
 def BS(S, K, T, r, sigma,type_op,D,T_div):
-    # Ajustement du sous-jacent
-    S_adj = S - D* np.exp(-r * T_div)
-
-    # Calculs standard de Black-Scholes
-    N = norm.cdf
-    d1 = (np.log(S_adj / K) + (r + sigma**2 / 2) * T) / (sigma * np.sqrt(T))
-    d2 = d1 - sigma * np.sqrt(T)
+    # Entrées scalaires: fonctions de math, sans le coût d'appel d'un ufunc NumPy
+    if isinstance(type_op, str) and all(np.isscalar(x) for x in (S, K, T, r, sigma, D, T_div)):
+        exp, log, sqrt = math.exp, math.log, math.sqrt
+        # Cas dégénérés (sigma nul, T nul ou négatif, dividende supérieur au sous-jacent,
+        # strike nul) : math lèverait une exception, NumPy rend inf/nan comme l'original
+        if T <= 0 or K <= 0 or sigma == 0 or S - D * math.exp(-r * T_div) <= 0:
+            exp, log, sqrt = np.exp, np.log, np.sqrt
+    else:
+        exp, log, sqrt = np.exp, np.log, np.sqrt
 
-    if type_op == "Call":
-        prix = S_adj * N(d1) - K * np.exp(-r * T) * N(d2)
-    elif type_op == "Put":
-        prix = K * np.exp(-r * T) * N(-d2) - S_adj * N(-d1)
+    # Ajustement du sous-jacent
+    S_adj = S - D* exp(-r * T_div)
+
+    # Calculs standard de Black-Scholes (tous les arguments numériques peuvent être des tableaux)
+    N = ndtr  # CDF de la loi normale (routine C, sans le wrapper de scipy.stats)
+    vol_sqrt_T = sigma * sqrt(T)
+    d1 = (log(S_adj / K) + (r + sigma**2 / 2) * T) / vol_sqrt_T
+    d2 = d1 - vol_sqrt_T
+    K_df = K * exp(-r * T)
+
+    if isinstance(type_op, str):
+        if type_op == "Call":
+            prix = S_adj * N(d1) - K_df * N(d2)
+        elif type_op == "Put":
+            prix = K_df * N(-d2) - S_adj * N(-d1)
+        else:
+            raise ValueError("type_op doit être 'Call' ou 'Put'")
     else:
-        raise ValueError("type_op doit être 'Call' ou 'Put'")
+        # Tableau de types: les deux formules sont évaluées puis sélectionnées
+        type_op = np.asarray(type_op)
+        if not np.isin(type_op, ("Call", "Put")).all():
+            raise ValueError("type_op doit être 'Call' ou 'Put'")
+        prix = np.where(type_op == "Call",
+                        S_adj * N(d1) - K_df * N(d2),
+                        K_df * N(-d2) - S_adj * N(-d1))
 
     return prix
 
 
+def BS_vec(S, K, T, r, sigma, type_op, D, T_div):
+    """
+    Prix Black-Scholes pour des tableaux de sous-jacents et/ou de strikes.
+
+    Les entrées sont converties en tableaux float64: d1, d2 et ndtr sont
+    calculés une seule fois pour tout le balayage (voir BS).
+    """
+    return BS(np.asarray(S, dtype=np.float64), np.asarray(K, dtype=np.float64),
+              T, r, sigma, type_op, D, T_div)
+
+
+# Paramètres de la feuille Pricer, dans l'ordre des lignes du bloc I7:I18
+PRICER_PARAMS_COL = "I"
+PRICER_PARAMS_FIRST_ROW = 7
+PRICER_PARAMS = ("Pr_Date", "St", "IntRate", "Vol", "DivAmount", "DivDate",
+                 "Mat", "OptType", "EU_US", "Strike", "Steps", "Affichage")
+PRICER_PARAMS_RANGE = (f"{PRICER_PARAMS_COL}{PRICER_PARAMS_FIRST_ROW}:"
+                       f"{PRICER_PARAMS_COL}{PRICER_PARAMS_FIRST_ROW + len(PRICER_PARAMS) - 1}")
+
+
+def _verifier_bloc_pricer(ws):
+    """
+    Vérifie que chaque nom de PRICER_PARAMS désigne bien sa cellule du bloc.
+
+    Le bloc est lu par position: si une cellule nommée a été déplacée ou une
+    ligne insérée, tous les paramètres seraient décalés sans erreur. On compare
+    donc l'adresse de chaque nom à la ligne attendue avant de lire le bloc.
+
+    Lève:
+    -----
+    ValueError
+        Si un nom ne pointe pas vers la cellule attendue de la feuille
+    """
+    names = ws.book.names
+    for i, name in enumerate(PRICER_PARAMS):
+        cellule = names[name].refers_to_range
+        attendue = f"${PRICER_PARAMS_COL}${PRICER_PARAMS_FIRST_ROW + i}"
+        if cellule.sheet.name != ws.name or cellule.address != attendue:
+            raise ValueError(
+                f"Le nom '{name}' désigne {cellule.sheet.name}!{cellule.address}, "
+                f"attendu {ws.name}!{attendue} (bloc {PRICER_PARAMS_RANGE})")
+
+
+def read_pricer_params(ws) -> dict:
+    """
+    Lit tout le bloc de paramètres de la feuille Pricer en un seul appel Excel.
+
+    La position de chaque nom est d'abord vérifiée (voir _verifier_bloc_pricer),
+    puis les valeurs du bloc sont associées aux noms de PRICER_PARAMS.
+
+    Retourne:
+    ---------
+    dict
+        Valeur de chaque paramètre, indexée par le nom de sa cellule
+    """
+    _verifier_bloc_pricer(ws)
+    return dict(zip(PRICER_PARAMS, ws.range(PRICER_PARAMS_RANGE).value))
+
+
 class OptionPricingParam:
     UND_SHIFT: float = 0.001 
     VOL_SHIFT: float = 0.005
     VOLGA_SHIFT: float = 0.01
 
-    def __init__(self, market, contract, n_steps: int):
+    # Shifts corrigés (utilisés à la place des valeurs initiales)
+    GAMMA_SHIFT: float = 0.05
+    VOLGA_SHIFT_CORR: float = 0.1
+    VANNA_VOL_SHIFT: float = 0.05
+
+    # En dessous de ce nombre d'étapes, lancer des processus coûte plus cher que les pricings
+    PARALLEL_MIN_STEPS: int = 2000
+
+    def __init__(self, market, contract, n_steps: int, tree_greeks: bool = False):
         self.stock_price = market.stock_price
         self.int_rate = market.int_rate
         self.sigma = market.sigma
@@ -44,55 +137,128 @@ class OptionPricingParam:
         self.strike = contract.strike
         self.op_type = contract.op_type
         self.op_exercice = contract.op_exercice
+        # Le contrat n'est jamais modifié par le pricing: partagé par tous les chocs
+        self.contract = contract
         
         self.n_steps = n_steps
+        # True: delta et gamma lus sur l'arbre non choqué (Contract.price_with_tree_greeks)
+        # au lieu des différences finies sur des arbres choqués
+        self.tree_greeks = tree_greeks
 
 
 def _PriceTreeBackward_OneDimPrice(params: OptionPricingParam, stock_price: float) -> float:
+    return _PriceTreeBackward_TwoDim(params, stock_price, params.sigma)
+
+def _PriceTreeBackward_OneDimSigma(params: OptionPricingParam, sigma: float) -> float:    
+    return _PriceTreeBackward_TwoDim(params, params.stock_price, sigma)
+
+def _PriceTreeBackward_TwoDim(params: OptionPricingParam, stock_price: float, sigma: float) -> float:
+    """
+    Prix par arbre trinomial pour un point (prix du sous-jacent, sigma) choqué.
 
+    Seul le marché change d'un choc à l'autre: le contrat de params est
+    réutilisé, un nouvel arbre complet est construit.
+    """
     market = Market(
         stock_price=stock_price,
         int_rate=params.int_rate,
-        sigma=params.sigma,
+        sigma=sigma,
         div=params.div,
         div_date=params.div_date
     )
-    
-    contract = Contract(
-        pricing_date=params.pricing_date,
-        maturity_date=params.maturity_date,
-        strike=params.strike,
-        op_type=params.op_type,
-        op_exercice=params.op_exercice
-    )
-    
+    contract = params.contract
+
     tree = Arbre(market=market, contract=contract, n_steps=params.n_steps)
-    
     price = contract.price_iteratively(tree)
-    
+
     return price
 
-def _PriceTreeBackward_OneDimSigma(params: OptionPricingParam, sigma: float) -> float:    
+def _PriceTreeBackward_TreeGreeks(params: OptionPricingParam) -> tuple:
+    # Un seul arbre au point de base: (prix, delta, gamma) lus sur sa colonne 1
     market = Market(
-        stock_price=params.stock_price, 
+        stock_price=params.stock_price,
         int_rate=params.int_rate,
-        sigma=sigma, 
+        sigma=params.sigma,
         div=params.div,
         div_date=params.div_date
     )
-    
-    contract = Contract(
-        pricing_date=params.pricing_date,
-        maturity_date=params.maturity_date,
-        strike=params.strike,
-        op_type=params.op_type,
-        op_exercice=params.op_exercice
+    tree = Arbre(market=market, contract=params.contract, n_steps=params.n_steps)
+    return params.contract.price_with_tree_greeks(tree)
+
+def _PriceTreeBackward_SameSigma(params: OptionPricingParam, stock_prices: list, sigma: float) -> list:
+    """
+    Prix par arbre de plusieurs prix du sous-jacent partageant le même sigma.
+
+    Sans dividende, la topologie de l'arbre ne dépend pas de S: un seul arbre
+    est construit puis rebasé pour les autres prix du sous-jacent (seuls les
+    prix des nœuds changent, voir Arbre.rebaser). Avec dividende, chaque prix
+    demande un arbre complet.
+    """
+    market = Market(
+        stock_price=stock_prices[0],
+        int_rate=params.int_rate,
+        sigma=sigma,
+        div=params.div,
+        div_date=params.div_date
     )
-    
+
+    contract = params.contract
+
     tree = Arbre(market=market, contract=contract, n_steps=params.n_steps)
-    price = contract.price_iteratively(tree)
-    
-    return price
+    prices = [contract.price_iteratively(tree)]
+
+    for stock_price in stock_prices[1:]:
+        if tree._div_step >= 0:
+            # Dividende: topologie dépendante de S, arbre complet
+            prices.append(_PriceTreeBackward_TwoDim(params, stock_price, sigma))
+            continue
+        bumped = Market(
+            stock_price=stock_price,
+            int_rate=params.int_rate,
+            sigma=sigma,
+            div=params.div,
+            div_date=params.div_date
+        )
+        prices.append(contract.price_iteratively(tree.rebaser(bumped)))
+
+    return prices
+
+def _price_points(params: OptionPricingParam, points: list) -> list:
+    """
+    Prix par arbre d'une liste de points (prix du sous-jacent, sigma), avec une
+    construction d'arbre par sigma.
+
+    Les groupes de même sigma sont indépendants: pour les grands arbres, ils sont
+    répartis sur un pool (un worker par sigma, dans la limite du nombre de cœurs).
+    Les noyaux Numba libèrent le GIL, des threads suffisent donc et évitent de
+    lancer des processus; sans Numba, un pool de processus est utilisé.
+
+    Retourne:
+    ---------
+    list[float]
+        Prix de chaque point, dans l'ordre de points
+    """
+    # Regroupement des points par sigma (même topologie d'arbre)
+    groups = {}
+    for stock_price, sigma in points:
+        groups.setdefault(sigma, []).append(stock_price)
+    sigmas = list(groups)
+    stock_prices = [groups[sigma] for sigma in sigmas]
+
+    n_workers = min(len(sigmas), os.cpu_count() or 1)
+    if n_workers > 1 and params.n_steps >= OptionPricingParam.PARALLEL_MIN_STEPS:
+        pool = ThreadPoolExecutor if NUMBA_DISPONIBLE else ProcessPoolExecutor
+        with pool(max_workers=n_workers) as executor:
+            group_prices = list(executor.map(_PriceTreeBackward_SameSigma, repeat(params), stock_prices, sigmas))
+    else:
+        group_prices = [_PriceTreeBackward_SameSigma(params, prices_S, sigma)
+                        for prices_S, sigma in zip(stock_prices, sigmas)]
+
+    # Remise dans l'ordre des points
+    prices = {}
+    for sigma, prices_S, values in zip(sigmas, stock_prices, group_prices):
+        prices.update(((stock_price, sigma), value) for stock_price, value in zip(prices_S, values))
+    return [prices[point] for point in points]
 
 class OneDimDerivative:
 
@@ -101,6 +267,9 @@ class OneDimDerivative:
         self.f: Callable[[object, float], float] = function
         self.param: object = other_parameters
         self.shift: float = shift
+        # Inverses des dénominateurs, calculés une fois par instance
+        self._inv_2shift: float = 0.5 / shift
+        self._inv_shift2: float = 1.0 / (shift * shift)
 
     def first(self, x: float) -> float:
         """
@@ -109,7 +278,7 @@ class OneDimDerivative:
         price_up = self.f(self.param, x + self.shift)
         price_down = self.f(self.param, x - self.shift)
         
-        return (price_up - price_down) / (2 * self.shift)
+        return (price_up - price_down) * self._inv_2shift
 
     def second(self, x: float) -> float:
         """
@@ -119,12 +288,16 @@ class OneDimDerivative:
         price_down = self.f(self.param, x - self.shift)
         price_mid = self.f(self.param, x) 
         
-        return (price_up + price_down - 2 * price_mid) / (self.shift ** 2)
-
-def calculate_delta(market, contract, n_steps: int) -> float:
+        return (price_up + price_down - 2.0 * price_mid) * self._inv_shift2
 
-    
-    params = OptionPricingParam(market, contract, n_steps)
+def calculate_delta(market, contract, n_steps: int, params: OptionPricingParam = None) -> float:
+    """
+    Calculates the option's Delta.
+    """
+    if params is None:
+        params = OptionPricingParam(market, contract, n_steps)
+    if params.tree_greeks:
+        return _PriceTreeBackward_TreeGreeks(params)[1]
     
     base_stock_price = market.stock_price
     shift = base_stock_price * OptionPricingParam.UND_SHIFT
@@ -141,15 +314,19 @@ def calculate_delta(market, contract, n_steps: int) -> float:
     
     return delta
 
-def calculate_gamma(market: Market, contract: Contract, n_steps: int) -> float:
+def calculate_gamma(market: Market, contract: Contract, n_steps: int,
+                    params: OptionPricingParam = None) -> float:
     """
     Calculates the option's Gamma.
     """
-    params = OptionPricingParam(market, contract, n_steps)
+    if params is None:
+        params = OptionPricingParam(market, contract, n_steps)
+    if params.tree_greeks:
+        return _PriceTreeBackward_TreeGreeks(params)[2]
     base_stock_price = market.stock_price
     #shift = base_stock_price * OptionPricingParam.UND_SHIFT (formule initiale=
     #shift corrigé
-    shift = base_stock_price * 0.05
+    shift = base_stock_price * OptionPricingParam.GAMMA_SHIFT
     
     pricer_function = cast(Callable[[object, float], float], _PriceTreeBackward_OneDimPrice)
     
@@ -163,11 +340,13 @@ def calculate_gamma(market: Market, contract: Contract, n_steps: int) -> float:
     return gamma
 
 
-def calculate_vega(market: Market, contract: Contract, n_steps: int) -> float:
+def calculate_vega(market: Market, contract: Contract, n_steps: int,
+                   params: OptionPricingParam = None) -> float:
     """
     f(sigma + 0.5%) - f(sigma - 0.5%)
     """
-    params = OptionPricingParam(market, contract, n_steps)
+    if params is None:
+        params = OptionPricingParam(market, contract, n_steps)
     base_sigma = market.sigma
     shift = OptionPricingParam.VOL_SHIFT 
     
@@ -179,27 +358,33 @@ def calculate_vega(market: Market, contract: Contract, n_steps: int) -> float:
     return price_up - price_down
 
 
-def calculate_volga(market: Market, contract: Contract, n_steps: int) -> float:
+def calculate_volga(market: Market, contract: Contract, n_steps: int,
+                    params: OptionPricingParam = None) -> float:
     """
     Vega(sigma + shift) - Vega(sigma)
     """
     base_sigma = market.sigma
     #volga_shift = OptionPricingParam.VOLGA_SHIFT formule initiale
     # shift corrigé
-    volga_shift= 0.1
-    market_up = Market(
-        stock_price=market.stock_price,
-        int_rate=market.int_rate,
-        sigma=base_sigma + volga_shift,
-        div=market.div,
-        div_date=market.div_date
-    )
-    vega_up = calculate_vega(market_up, contract, n_steps)
-    vega_base = calculate_vega(market, contract, n_steps)
+    volga_shift = OptionPricingParam.VOLGA_SHIFT_CORR
+    hV = OptionPricingParam.VOL_SHIFT
+    sigma_up = base_sigma + volga_shift
+
+    # Les quatre sigmas en un seul appel (pricés en parallèle pour les grands arbres)
+    if params is None:
+        params = OptionPricingParam(market, contract, n_steps)
+    S = market.stock_price
+    f_up_up, f_up_down, f_up, f_down = _price_points(params, [
+        (S, sigma_up + hV), (S, sigma_up - hV),      # Vega(sigma + shift)
+        (S, base_sigma + hV), (S, base_sigma - hV),  # Vega(sigma)
+    ])
+    vega_up = f_up_up - f_up_down
+    vega_base = f_up - f_down
     return vega_up - vega_base
 
 
-def calculate_vanna(market: Market, contract: Contract, n_steps: int) -> float:
+def calculate_vanna(market: Market, contract: Contract, n_steps: int,
+                    params: OptionPricingParam = None) -> float:
     """
     Vanna ≈ [ f(S+hS,σ+hσ) - f(S+hS,σ-hσ) - f(S-hS,σ+hσ) + f(S-hS,σ-hσ) ] / (4 hS hσ)
     """
@@ -210,24 +395,87 @@ def calculate_vanna(market: Market, contract: Contract, n_steps: int) -> float:
 
     #hV = OptionPricingParam.VOL_SHIFT (formule initiale)
     #shift corrigé
-    hV=0.05
+    hV = OptionPricingParam.VANNA_VOL_SHIFT
+
+    # Coins du schéma mixte: un arbre par sigma, rebasé pour l'autre prix du sous-jacent
+    if params is None:
+        params = OptionPricingParam(market, contract, n_steps)
+    f_pp, f_mp, f_pm, f_mm = _price_points(params, [
+        (base_S + hS, base_sigma + hV),   # +S, +σ
+        (base_S - hS, base_sigma + hV),   # -S, +σ
+        (base_S + hS, base_sigma - hV),   # +S, -σ
+        (base_S - hS, base_sigma - hV),   # -S, -σ
+    ])
 
-    # On suit le pattern existant: on varie S via _PriceTreeBackward_OneDimPrice
-    # et σ en modifiant params.sigma
-    pricer_function = cast(Callable[[object, float], float], _PriceTreeBackward_OneDimPrice)
+    vanna = (f_pp - f_pm - f_mp + f_mm) / (4.0 * hS * hV)
+    return vanna
 
-    # Params pour sigma up / sigma down
-    params_sigma_up = OptionPricingParam(market, contract, n_steps)
-    params_sigma_up.sigma = base_sigma + hV
 
-    params_sigma_down = OptionPricingParam(market, contract, n_steps)
-    params_sigma_down.sigma = base_sigma - hV
+def calculate_all_greeks(market: Market, contract: Contract, n_steps: int,
+                         tree_greeks: bool = False) -> dict:
+    """
+    Calcule Delta, Gamma, Vega, Volga et Vanna en une seule fois.
 
-    # Coins du schéma mixte
-    f_pp = pricer_function(params_sigma_up,   base_S + hS)  # +S, +σ
-    f_pm = pricer_function(params_sigma_down, base_S + hS)  # +S, -σ
-    f_mp = pricer_function(params_sigma_up,   base_S - hS)  # -S, +σ
-    f_mm = pricer_function(params_sigma_down, base_S - hS)  # -S, -σ
+    Mêmes chocs et mêmes formules que les fonctions calculate_*, mais chaque
+    point (prix du sous-jacent, sigma) n'est pricé qu'une fois: les arbres du
+    vega sont partagés avec le volga. Pour les grands arbres, les points sont
+    pricés en parallèle. Les params sont construits une seule fois ici; les
+    fonctions calculate_* les acceptent aussi via leur argument params.
 
-    vanna = (f_pp - f_pm - f_mp + f_mm) / (4.0 * hS * hV)
-    return vanna
\ No newline at end of file
+    Avec tree_greeks=True, delta et gamma sont lus sur l'arbre non choqué
+    (Contract.price_with_tree_greeks) au lieu des arbres choqués.
+
+    Retourne:
+    ---------
+    dict
+        Grecques indexées par "delta", "gamma", "vega", "volga", "vanna"
+    """
+    params = OptionPricingParam(market, contract, n_steps, tree_greeks)
+    S = market.stock_price
+    sigma = market.sigma
+
+    # ===== Chocs =====
+    hS = S * OptionPricingParam.UND_SHIFT
+    hG = S * OptionPricingParam.GAMMA_SHIFT
+    hV = OptionPricingParam.VOL_SHIFT
+    sigma_up = sigma + OptionPricingParam.VOLGA_SHIFT_CORR
+    hVanna = OptionPricingParam.VANNA_VOL_SHIFT
+
+    # ===== Points (S, sigma) à pricer, sans doublon =====
+    points = [] if tree_greeks else [
+        (S + hS, sigma), (S - hS, sigma),                              # Delta
+        (S + hG, sigma), (S - hG, sigma), (S, sigma),                  # Gamma
+    ]
+    points += [
+        (S, sigma + hV), (S, sigma - hV),                              # Vega
+        (S, sigma_up + hV), (S, sigma_up - hV),                        # Volga
+        (S + hS, sigma + hVanna), (S + hS, sigma - hVanna),            # Vanna
+        (S - hS, sigma + hVanna), (S - hS, sigma - hVanna),
+    ]
+    points = list(dict.fromkeys(points))
+    prices = dict(zip(points, _price_points(params, points)))
+
+    def price(stock_price: float, vol: float) -> float:
+        return prices[(stock_price, vol)]
+
+    if tree_greeks:
+        # Delta et Gamma: un seul pricing, sur les nœuds de la colonne 1
+        _, delta, gamma = _PriceTreeBackward_TreeGreeks(params)
+    else:
+        # Delta: (f(S+h) - f(S-h)) / 2h
+        delta = (price(S + hS, sigma) - price(S - hS, sigma)) / (2 * hS)
+
+        # Gamma: (f(S+h) + f(S-h) - 2 f(S)) / h^2
+        gamma = (price(S + hG, sigma) + price(S - hG, sigma) - 2 * price(S, sigma)) / (hG * hG)
+
+    # Vega: f(sigma + shift) - f(sigma - shift)
+    vega = price(S, sigma + hV) - price(S, sigma - hV)
+
+    # Volga: Vega(sigma + shift) - Vega(sigma)
+    volga = (price(S, sigma_up + hV) - price(S, sigma_up - hV)) - vega
+
+    # Vanna: différences croisées en S et sigma
+    vanna = (price(S + hS, sigma + hVanna) - price(S + hS, sigma - hVanna)
+             - price(S - hS, sigma + hVanna) + price(S - hS, sigma - hVanna)) / (4.0 * hS * hVanna)
+
+    return {"delta": delta, "gamma": gamma, "vega": vega, "volga": volga, "vanna": vanna}
\ No newline at end of file
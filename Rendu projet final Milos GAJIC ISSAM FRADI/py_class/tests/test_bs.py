@@ -0,0 +1,18 @@
+import math
+
+from py_class.utils import BS
+
+
+def test_bs_sigma_nul():
+    # Sigma nul: valeur intrinsèque actualisée, comme avec les fonctions NumPy
+    prix = BS(100, 100, 1.0, 0.05, 0.0, "Call", 0, 0)
+    assert math.isclose(prix, 100 - 100 * math.exp(-0.05), rel_tol=1e-12)
+
+
+def test_bs_maturite_nulle():
+    # T nul (maturité égale à la date de pricing): nan, sans exception
+    assert math.isnan(BS(100, 100, 0.0, 0.05, 0.2, "Call", 0, 0))
+
+
+def test_bs_dividende_superieur_au_sous_jacent():
+    assert math.isnan(BS(100, 100, 1.0, 0.05, 0.2, "Put", 150, 0.5))